@@ -0,0 +1,138 @@
+"""
+Compact selector/topic/layout tables distilled from abis.py
+
+The full ABIs are ~26 KB of Python literals and hashing their signatures
+pulls in keccak. Everything the hot path needs from them (function names,
+4-byte selectors, input names/types and event topics) is precomputed into
+abi_tables.json, a few KB of JSON that loads in well under a millisecond.
+The file is rebuilt automatically when abis.py or the signature list
+changes, or ahead of time with:
+
+    python abi_tables.py [path]
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+
+ABI_NAMES = ('FACTORY_ABI', 'ROUTER_ABI', 'MULTICALL3_ABI', 'ERC20_ABI')
+
+# Events and calls referenced by signature outside the ABIs
+SIGNATURES = (
+    'Sync(uint112,uint112)',
+    'Swap(address,uint256,uint256,uint256,uint256,address)',
+    'PairCreated(address,address,address,uint256)',
+)
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+TABLES_PATH = os.path.join(_HERE, 'abi_tables.json')
+
+_tables = None
+_functions = {}
+
+
+def _keccak(text):
+    from eth_utils import keccak
+    return keccak(text = text)
+
+
+def source_digest():
+    """Fingerprint of the inputs, a stale tables file is rebuilt"""
+    digest = hashlib.sha1()
+    with open(os.path.join(_HERE, 'abis.py'), 'rb') as f:
+        digest.update(f.read())
+    digest.update('\n'.join(SIGNATURES).encode())
+    return digest.hexdigest()
+
+
+def build():
+    import abis
+    from swap_decoder import canonical_type
+
+    functions = {}
+    for abi_name in ABI_NAMES:
+        entries = []
+        for entry in getattr(abis, abi_name):
+            if entry.get('type') != 'function':
+                continue
+            types = [canonical_type(arg) for arg in entry['inputs']]
+            signature = f"{entry['name']}({','.join(types)})"
+            entries.append([
+                entry['name'],
+                _keccak(signature)[:4].hex(),
+                [[arg['name'], arg_type] for arg, arg_type in zip(entry['inputs'], types)],
+            ])
+        functions[abi_name] = entries
+
+    return {
+        'source': source_digest(),
+        'functions': functions,
+        'hashes': {signature: _keccak(signature).hex() for signature in SIGNATURES},
+    }
+
+
+def write(tables, path = TABLES_PATH):
+    temporary = f"{path}.tmp"
+    with open(temporary, 'w') as f:
+        json.dump(tables, f, separators = (',', ':'))
+    os.replace(temporary, path)
+
+
+def load(path = TABLES_PATH):
+    """Tables from disk, built and cached there on first use or when stale"""
+    global _tables
+    if _tables is not None:
+        return _tables
+
+    digest = source_digest()
+    try:
+        with open(path) as f:
+            tables = json.load(f)
+        if tables.get('source') != digest:
+            tables = None
+    except (OSError, ValueError):
+        tables = None
+
+    if tables is None:
+        tables = build()
+        try:
+            write(tables, path)
+        except OSError as e:
+            logging.warning(f"Could not cache ABI tables at {path}: {e}")
+
+    _tables = tables
+    return tables
+
+
+def functions(abi_name):
+    """
+    Function entries of one ABI in ABI shape (name, type, inputs) plus the
+    precomputed 'selector', accepted wherever a full ABI entry is
+    """
+    entries = _functions.get(abi_name)
+    if entries is None:
+        entries = _functions[abi_name] = [
+            {
+                'type': 'function',
+                'name': name,
+                'selector': bytes.fromhex(selector),
+                'inputs': [{'name': arg_name, 'type': arg_type} for arg_name, arg_type in inputs],
+            }
+            for name, selector, inputs in load()['functions'][abi_name]
+        ]
+    return entries
+
+
+def topic(signature):
+    """'0x' + keccak256 of an event signature"""
+    value = load()['hashes'].get(signature)
+    if value is None:
+        value = _keccak(signature).hex()
+    return '0x' + value
+
+
+if __name__ == '__main__':
+    target = sys.argv[1] if len(sys.argv) > 1 else TABLES_PATH
+    write(build(), target)
+    print(f"Wrote {target} ({os.path.getsize(target)} bytes)")
@@ -0,0 +1,96 @@
+"""
+Batched constant-product AMM math on numpy arrays
+
+Exposed through amm_math (amm_math.get_amounts_out, ...), see there.
+"""
+import numpy as np
+
+from amm_math import FEE_DENOMINATOR, FEE_NUMERATOR, max_frontrun_input, optimal_arbitrage_input
+
+
+_INT64_MAX = np.iinfo(np.int64).max
+
+
+def _operands(*values):
+    """Broadcast inputs to object arrays of Python ints"""
+    return np.broadcast_arrays(*(np.asarray(value, dtype=object) for value in values))
+
+
+def _fits_int64(*bounds):
+    return all(bound <= _INT64_MAX for bound in bounds)
+
+
+def _max(array):
+    return int(array.max()) if array.size else 0
+
+
+def get_amounts_out(amount_in, reserve_in, reserve_out):
+    """
+    Batched getAmountOut
+
+    Returns:
+        int64 ndarray when every intermediate fits, object ndarray of Python ints otherwise
+    """
+    amount_in, reserve_in, reserve_out = _operands(amount_in, reserve_in, reserve_out)
+    max_in = _max(amount_in)
+    if _fits_int64(max_in * FEE_NUMERATOR * _max(reserve_out),
+                   _max(reserve_in) * FEE_DENOMINATOR + max_in * FEE_NUMERATOR):
+        amount_in = amount_in.astype(np.int64)
+        reserve_in = reserve_in.astype(np.int64)
+        reserve_out = reserve_out.astype(np.int64)
+
+    valid = (amount_in > 0) & (reserve_in > 0) & (reserve_out > 0)
+    amount_in_with_fee = amount_in * FEE_NUMERATOR
+    numerator = amount_in_with_fee * reserve_out
+    denominator = reserve_in * FEE_DENOMINATOR + amount_in_with_fee
+    denominator = np.where(valid, denominator, 1)
+    return np.where(valid, numerator // denominator, 0)
+
+
+def get_amounts_in(amount_out, reserve_in, reserve_out):
+    """Batched getAmountIn, 0 where the pool cannot pay amount_out"""
+    amount_out, reserve_in, reserve_out = _operands(amount_out, reserve_in, reserve_out)
+    if _fits_int64(_max(reserve_in) * _max(amount_out) * FEE_DENOMINATOR,
+                   _max(reserve_out) * FEE_NUMERATOR):
+        amount_out = amount_out.astype(np.int64)
+        reserve_in = reserve_in.astype(np.int64)
+        reserve_out = reserve_out.astype(np.int64)
+
+    valid = (amount_out > 0) & (reserve_in > 0) & (reserve_out > amount_out)
+    numerator = reserve_in * amount_out * FEE_DENOMINATOR
+    denominator = np.where(valid, (reserve_out - amount_out) * FEE_NUMERATOR, 1)
+    return np.where(valid, numerator // denominator + 1, 0)
+
+
+def price_impacts(amount_in, reserve_in, reserve_out):
+    """Batched price_impact as float64"""
+    amount_out = get_amounts_out(amount_in, reserve_in, reserve_out)
+    amount_in, reserve_in, reserve_out = _operands(amount_in, reserve_in, reserve_out)
+    ideal = (amount_in * reserve_out).astype(np.float64)
+    actual = (amount_out * reserve_in).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        impact = 1.0 - actual / ideal
+    return np.where(ideal > 0, impact, 0.0)
+
+
+def implied_slippages(amount_in, amount_out_min, reserve_in, reserve_out):
+    """Batched implied_slippage as float64"""
+    expected = get_amounts_out(amount_in, reserve_in, reserve_out).astype(np.float64)
+    minimum = np.asarray(amount_out_min, dtype=object).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slippage = 1.0 - minimum / expected
+    return np.where(expected > 0, slippage, 0.0)
+
+
+_max_frontrun_ufunc = np.frompyfunc(max_frontrun_input, 4, 1)
+_optimal_arbitrage_ufunc = np.frompyfunc(optimal_arbitrage_input, 4, 1)
+
+
+def max_frontrun_inputs(victim_in, victim_min_out, reserve_in, reserve_out):
+    """Batched max_frontrun_input, object ndarray of Python ints"""
+    return _max_frontrun_ufunc(*_operands(victim_in, victim_min_out, reserve_in, reserve_out))
+
+
+def optimal_arbitrage_inputs(reserve_a_in, reserve_a_out, reserve_b_in, reserve_b_out):
+    """Batched optimal_arbitrage_input, object ndarray of Python ints"""
+    return _optimal_arbitrage_ufunc(*_operands(reserve_a_in, reserve_a_out, reserve_b_in, reserve_b_out))
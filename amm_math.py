@@ -0,0 +1,117 @@
+"""
+Constant-product (Uniswap V2) AMM math, scalar and batched
+
+The scalar functions mirror UniswapV2Library exactly and are the reference.
+The batched functions take array-likes of equal (broadcastable) shape and
+evaluate a whole block of candidates at once. Integer results are exact:
+when every intermediate product fits in int64 the work runs on int64
+arrays, otherwise it falls back to object-dtype arrays of Python ints so
+uint112 reserves times uint256 amounts never overflow.
+
+The batched functions live in amm_batch.py and are loaded on first use, so
+importing this module does not import numpy.
+"""
+from math import isqrt
+
+
+FEE_NUMERATOR = 997
+FEE_DENOMINATOR = 1000
+
+
+def get_amount_out(amount_in, reserve_in, reserve_out):
+    """UniswapV2Library.getAmountOut, returns 0 for empty input or reserves"""
+    if amount_in <= 0 or reserve_in <= 0 or reserve_out <= 0:
+        return 0
+    amount_in_with_fee = amount_in * FEE_NUMERATOR
+    return (amount_in_with_fee * reserve_out) // (reserve_in * FEE_DENOMINATOR + amount_in_with_fee)
+
+
+def get_amount_in(amount_out, reserve_in, reserve_out):
+    """UniswapV2Library.getAmountIn, returns 0 when the pool cannot pay amount_out"""
+    if amount_out <= 0 or reserve_in <= 0 or reserve_out <= amount_out:
+        return 0
+    numerator = reserve_in * amount_out * FEE_DENOMINATOR
+    denominator = (reserve_out - amount_out) * FEE_NUMERATOR
+    return numerator // denominator + 1
+
+
+def price_impact(amount_in, reserve_in, reserve_out):
+    """Fraction of the mid-price output lost to the curve and the fee"""
+    if amount_in <= 0 or reserve_in <= 0 or reserve_out <= 0:
+        return 0.0
+    amount_out = get_amount_out(amount_in, reserve_in, reserve_out)
+    return 1.0 - (amount_out * reserve_in) / (amount_in * reserve_out)
+
+
+def implied_slippage(amount_in, amount_out_min, reserve_in, reserve_out):
+    """Slippage tolerance a swap allows, 1 - amountOutMin / expected amountOut"""
+    expected = get_amount_out(amount_in, reserve_in, reserve_out)
+    if expected <= 0:
+        return 0.0
+    return 1.0 - amount_out_min / expected
+
+
+def max_frontrun_input(victim_in, victim_min_out, reserve_in, reserve_out):
+    """
+    Largest input swapped ahead of a victim in the same direction that still
+    leaves the victim at or above victim_min_out
+
+    Solves (1000R + 997x)(1000R + 1000x + 997v) <= 1000 * 997 * v * R * R_out / m
+    for x, then corrects for getAmountOut's integer rounding.
+    """
+    if victim_in <= 0 or victim_min_out <= 0 or reserve_in <= 0 or reserve_out <= 0:
+        return 0
+    if get_amount_out(victim_in, reserve_in, reserve_out) < victim_min_out:
+        return 0
+
+    a = FEE_NUMERATOR * FEE_DENOMINATOR
+    b = (FEE_NUMERATOR * (FEE_DENOMINATOR * reserve_in + FEE_NUMERATOR * victim_in)
+         + FEE_DENOMINATOR * FEE_DENOMINATOR * reserve_in)
+    bound = FEE_DENOMINATOR * FEE_NUMERATOR * victim_in * reserve_in * reserve_out // victim_min_out
+    c = FEE_DENOMINATOR * reserve_in * (FEE_DENOMINATOR * reserve_in + FEE_NUMERATOR * victim_in) - bound
+    if c >= 0:
+        return 0
+    x = (isqrt(b * b - 4 * a * c) - b) // (2 * a)
+
+    # The quadratic ignores floor division inside getAmountOut, step back until exact
+    while x > 0 and not _victim_clears(x, victim_in, victim_min_out, reserve_in, reserve_out):
+        x -= max(1, x >> 40)
+    return max(x, 0)
+
+
+def _victim_clears(frontrun_in, victim_in, victim_min_out, reserve_in, reserve_out):
+    frontrun_out = get_amount_out(frontrun_in, reserve_in, reserve_out)
+    victim_out = get_amount_out(victim_in, reserve_in + frontrun_in, reserve_out - frontrun_out)
+    return victim_out >= victim_min_out
+
+
+def optimal_arbitrage_input(reserve_a_in, reserve_a_out, reserve_b_in, reserve_b_out):
+    """
+    Profit-maximizing input for buying on pool A and selling on pool B
+
+    The two pools compose into one constant-product curve with
+    R_in = Ra_in * Rb_in / D and R_out = g * Ra_out * Rb_out / D, D = Rb_in + g * Ra_out,
+    whose optimum is (sqrt(g * R_in * R_out) - R_in) / g. Returns 0 when there
+    is no profitable direction.
+    """
+    if min(reserve_a_in, reserve_a_out, reserve_b_in, reserve_b_out) <= 0:
+        return 0
+    root = isqrt(reserve_a_in * reserve_a_out * reserve_b_in * reserve_b_out)
+    numerator = (FEE_NUMERATOR * root - FEE_DENOMINATOR * reserve_a_in * reserve_b_in) * FEE_DENOMINATOR
+    if numerator <= 0:
+        return 0
+    denominator = FEE_NUMERATOR * (FEE_DENOMINATOR * reserve_b_in + FEE_NUMERATOR * reserve_a_out)
+    return numerator // denominator
+
+
+_BATCHED = (
+    'get_amounts_out', 'get_amounts_in', 'price_impacts', 'implied_slippages',
+    'max_frontrun_inputs', 'optimal_arbitrage_inputs',
+)
+
+
+def __getattr__(name):
+    if name in _BATCHED:
+        import amm_batch
+        return getattr(amm_batch, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
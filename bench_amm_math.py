@@ -0,0 +1,88 @@
+"""
+Benchmark and equality check for the batched AMM math
+
+Generates random candidates in two regimes, small values that stay on the
+int64 path and realistic 18-decimal values that need exact big integers,
+checks every batched result against the scalar reference and reports the
+per-candidate cost of both.
+
+Usage:
+    python bench_amm_math.py [candidates] [rounds]
+"""
+import random
+import sys
+import time
+
+import amm_math
+
+
+def build_candidates(count, low, high, rng):
+    reserve_in = [rng.randint(low, high) for _ in range(count)]
+    reserve_out = [rng.randint(low, high) for _ in range(count)]
+    amount_in = [rng.randint(1, reserve // 20) for reserve in reserve_in]
+    amount_out = [rng.randint(1, reserve // 20) for reserve in reserve_out]
+    amount_out_min = [
+        amm_math.get_amount_out(amount, r_in, r_out) * rng.randint(900, 999) // 1000
+        for amount, r_in, r_out in zip(amount_in, reserve_in, reserve_out)
+    ]
+    return amount_in, amount_out, amount_out_min, reserve_in, reserve_out
+
+
+def check(candidates):
+    amount_in, amount_out, amount_out_min, reserve_in, reserve_out = candidates
+    rows = list(zip(amount_in, amount_out, amount_out_min, reserve_in, reserve_out))
+
+    batched = amm_math.get_amounts_out(amount_in, reserve_in, reserve_out)
+    assert [int(v) for v in batched] == [amm_math.get_amount_out(a, ri, ro) for a, _, _, ri, ro in rows]
+
+    batched = amm_math.get_amounts_in(amount_out, reserve_in, reserve_out)
+    assert [int(v) for v in batched] == [amm_math.get_amount_in(o, ri, ro) for _, o, _, ri, ro in rows]
+
+    batched = amm_math.max_frontrun_inputs(amount_in, amount_out_min, reserve_in, reserve_out)
+    assert [int(v) for v in batched] == [amm_math.max_frontrun_input(a, m, ri, ro) for a, _, m, ri, ro in rows]
+
+    batched = amm_math.implied_slippages(amount_in, amount_out_min, reserve_in, reserve_out)
+    scalar = [amm_math.implied_slippage(a, m, ri, ro) for a, _, m, ri, ro in rows]
+    assert all(abs(b - s) < 1e-9 for b, s in zip(batched, scalar))
+
+
+def bench(label, candidates, rounds):
+    amount_in, _, amount_out_min, reserve_in, reserve_out = candidates
+    rows = list(zip(amount_in, amount_out_min, reserve_in, reserve_out))
+    count = len(rows)
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for a, m, ri, ro in rows:
+            amm_math.get_amount_out(a, ri, ro)
+            amm_math.implied_slippage(a, m, ri, ro)
+    scalar = (time.perf_counter() - started) / (rounds * count)
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        amm_math.get_amounts_out(amount_in, reserve_in, reserve_out)
+        amm_math.implied_slippages(amount_in, amount_out_min, reserve_in, reserve_out)
+    batched = (time.perf_counter() - started) / (rounds * count)
+
+    print(f"{label:8} n={count:6} scalar={scalar * 1e6:7.3f} us/candidate "
+          f"batched={batched * 1e6:7.3f} us/candidate speedup={scalar / batched:5.1f}x")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = random.Random(7)
+
+    small = build_candidates(count, 10 ** 6, 10 ** 8, rng)
+    wide = build_candidates(count, 10 ** 18, 10 ** 30, rng)
+
+    check(small)
+    check(wide)
+    print("batched results match the scalar reference")
+
+    bench('int64', small, rounds)
+    bench('exact', wide, rounds)
+
+
+if __name__ == '__main__':
+    main()
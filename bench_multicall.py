@@ -0,0 +1,200 @@
+"""
+Benchmark for MulticallBatcher against a local stand-in JSON-RPC server
+
+The server answers eth_call over HTTP after a fixed simulated latency and
+understands aggregate3, so the benchmark compares one RPC per read with the
+coalesced batches and reports the call reduction and per-read latency.
+
+Usage:
+    python bench_multicall.py [reads] [latency_ms]
+"""
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault('RPC_URL', 'http://127.0.0.1:8545')
+os.environ.setdefault('WEBSOCKET_URL', 'ws://127.0.0.1:8546')
+
+import constant
+from multicall import AGGREGATE3_SELECTOR, MulticallBatcher, MulticallError
+
+MULTICALL = bytes.fromhex(constant.MULTICALL_ADDRESS[2:])
+REVERTING = bytes.fromhex('de' * 20)
+GET_RESERVES = bytes.fromhex('0902f1ac')
+
+
+def fake_result(target, data):
+    """Deterministic 32-byte return value for a sub-call"""
+    return (sum(target) * 31 + sum(data)).to_bytes(32, 'big')
+
+
+def decode_aggregate3_calls(data):
+    from_bytes = int.from_bytes
+    args = data[4:]
+    array = from_bytes(args[0:32], 'big')
+    count = from_bytes(args[array:array + 32], 'big')
+    base = array + 32
+    calls = []
+    for index in range(count):
+        element = base + from_bytes(args[base + index * 32:base + index * 32 + 32], 'big')
+        target = args[element + 12:element + 32]
+        start = element + from_bytes(args[element + 64:element + 96], 'big')
+        length = from_bytes(args[start:start + 32], 'big')
+        calls.append((target, args[start + 32:start + 32 + length]))
+    return calls
+
+
+def encode_results(results):
+    offsets = []
+    elements = []
+    position = len(results) * 32
+    for success, data in results:
+        offsets.append(position.to_bytes(32, 'big'))
+        padded = data.ljust((len(data) + 31) // 32 * 32, b'\0')
+        element = (
+            int(success).to_bytes(32, 'big')
+            + (64).to_bytes(32, 'big')
+            + len(data).to_bytes(32, 'big')
+            + padded
+        )
+        elements.append(element)
+        position += len(element)
+    return (32).to_bytes(32, 'big') + len(results).to_bytes(32, 'big') + b''.join(offsets) + b''.join(elements)
+
+
+class StandInRpc:
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+
+    def eth_call(self, target, data):
+        if target == MULTICALL and data[:4] == AGGREGATE3_SELECTOR:
+            results = [
+                (sub_target != REVERTING, fake_result(sub_target, sub_data) if sub_target != REVERTING else b'')
+                for sub_target, sub_data in decode_aggregate3_calls(data)
+            ]
+            return encode_results(results)
+        if target == REVERTING:
+            raise ValueError("execution reverted")
+        return fake_result(target, data)
+
+    async def handle(self, reader, writer):
+        try:
+            headers = await reader.readuntil(b'\r\n\r\n')
+            length = 0
+            for line in headers.split(b'\r\n'):
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':')[1])
+            request = json.loads(await reader.readexactly(length))
+            self.requests += 1
+            await asyncio.sleep(self.latency)
+
+            call = request['params'][0]
+            try:
+                result = self.eth_call(bytes.fromhex(call['to'][2:]), bytes.fromhex(call['data'][2:]))
+                response = {'jsonrpc': '2.0', 'id': request['id'], 'result': '0x' + result.hex()}
+            except ValueError as e:
+                response = {'jsonrpc': '2.0', 'id': request['id'], 'error': {'code': 3, 'message': str(e)}}
+
+            body = json.dumps(response).encode()
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: '
+                         + str(len(body)).encode() + b'\r\nConnection: close\r\n\r\n' + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+async def http_eth_call(port, target, data):
+    """Minimal one-shot HTTP JSON-RPC eth_call client"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    body = json.dumps({
+        'jsonrpc': '2.0', 'id': 1, 'method': 'eth_call',
+        'params': [{'to': '0x' + target.hex(), 'data': '0x' + data.hex()}, 'latest']
+    }).encode()
+    writer.write(b'POST / HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\nContent-Length: '
+                 + str(len(body)).encode() + b'\r\n\r\n' + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    payload = json.loads(response.split(b'\r\n\r\n', 1)[1])
+    if 'error' in payload:
+        raise ValueError(payload['error']['message'])
+    return bytes.fromhex(payload['result'][2:])
+
+
+def build_reads(count):
+    reads = []
+    for index in range(count):
+        if index % 50 == 49:
+            reads.append((REVERTING, GET_RESERVES))
+        else:
+            # A few hundred distinct pairs, bursts naturally repeat some of them
+            reads.append(((index % 300).to_bytes(20, 'big'), GET_RESERVES))
+    return reads
+
+
+async def timed(coro_factory, reads):
+    latencies = []
+    failures = 0
+
+    async def one(target, data):
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            result = await coro_factory(target, data)
+            assert result == fake_result(target, data)
+        except (MulticallError, ValueError):
+            failures += 1
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(target, data) for target, data in reads))
+    return time.perf_counter() - started, latencies, failures
+
+
+def report(label, rpc_calls, reads, wall, latencies, failures):
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{label:10} reads={reads:5} rpc_calls={rpc_calls:5} failed={failures:3} "
+          f"wall={wall * 1e3:8.2f} ms p50={statistics.median(latencies) * 1e3:7.2f} ms p99={p99 * 1e3:7.2f} ms")
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = float(sys.argv[2]) / 1e3 if len(sys.argv) > 2 else 0.005
+
+    rpc = StandInRpc(latency)
+    server = await asyncio.start_server(rpc.handle, '127.0.0.1', 0, backlog=4096)
+    port = server.sockets[0].getsockname()[1]
+    reads = build_reads(count)
+
+    async def direct(target, data):
+        return await http_eth_call(port, target, data)
+
+    # Keep the naive baseline from exhausting local sockets
+    limit = asyncio.Semaphore(256)
+
+    async def direct_limited(target, data):
+        async with limit:
+            return await direct(target, data)
+
+    rpc.requests = 0
+    wall, latencies, failures = await timed(direct_limited, reads)
+    report('direct', rpc.requests, count, wall, latencies, failures)
+
+    batcher = MulticallBatcher(direct)
+    rpc.requests = 0
+    wall, latencies, failures = await timed(batcher.call, reads)
+    await batcher.close()
+    report('batched', rpc.requests, count, wall, latencies, failures)
+    print(f"call reduction: {count / max(1, rpc.requests):.1f}x")
+
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
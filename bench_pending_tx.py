@@ -0,0 +1,134 @@
+"""
+Per-message cost of the pending transaction fast path
+
+Runs a frame corpus through PendingTxParser and through the old
+json.loads + dict path and reports the cost per frame. The corpus is a
+replay.py recording (.gz) or a file with one raw websocket frame per line;
+without one a synthetic corpus is generated with mostly non-swap router
+calls, like the live feed.
+
+Usage:
+    python bench_pending_tx.py [corpus_file|recording.gz] [rounds]
+"""
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('RPC_URL', 'http://127.0.0.1:8545')
+os.environ.setdefault('WEBSOCKET_URL', 'ws://127.0.0.1:8546')
+
+import constant
+from bench_swap_decoder import TOKEN, build_samples
+from pending_tx import PendingTxParser
+from replay import read_frames
+
+OTHER_SELECTORS = ('e8e33700', 'f305d719', 'baa2abde', '02751cec', 'ded9382a', '2195995c')
+
+
+def synthetic_frame(rng, calldata):
+    transaction = {
+        'blockHash': None,
+        'blockNumber': None,
+        'from': '0x' + rng.randbytes(20).hex(),
+        'gas': hex(rng.randint(100_000, 400_000)),
+        'gasPrice': hex(rng.randint(10 ** 9, 10 ** 11)),
+        'maxFeePerGas': hex(rng.randint(10 ** 9, 10 ** 11)),
+        'maxPriorityFeePerGas': hex(rng.randint(10 ** 8, 10 ** 9)),
+        'hash': '0x' + rng.randbytes(32).hex(),
+        'input': '0x' + calldata.hex(),
+        'nonce': hex(rng.randint(0, 5000)),
+        'to': constant.ROUTER_ADDRESS.lower(),
+        'transactionIndex': None,
+        'value': hex(rng.randint(0, 10 ** 19)),
+        'type': '0x2',
+        'chainId': '0x1',
+        'v': '0x1',
+        'r': '0x' + rng.randbytes(32).hex(),
+        's': '0x' + rng.randbytes(32).hex(),
+    }
+    return json.dumps({
+        'jsonrpc': '2.0',
+        'method': 'eth_subscription',
+        'params': {'result': transaction, 'subscription': '0x' + rng.randbytes(16).hex()},
+    })
+
+
+def synthetic_corpus(count, swap_share = 0.2, tokens = 1):
+    """Raw pending tx frames, swaps trade WETH against one of `tokens` tokens"""
+    rng = random.Random(11)
+    swaps = [calldata for _, calldata in build_samples()]
+    pool = [TOKEN] + [rng.randbytes(20) for _ in range(tokens - 1)]
+    frames = []
+    for _ in range(count):
+        if rng.random() < swap_share:
+            calldata = rng.choice(swaps)
+            if tokens > 1:
+                calldata = calldata.replace(TOKEN, rng.choice(pool))
+        else:
+            calldata = bytes.fromhex(rng.choice(OTHER_SELECTORS)) + rng.randbytes(32 * 8)
+        frames.append(synthetic_frame(rng, calldata))
+    return frames
+
+
+def baseline(frame, router):
+    # The pre-fast-path handling: full dict, string compare, hex conversions
+    data = json.loads(frame)
+    transaction = data['params']['result']
+    if not transaction['to'] or transaction['to'].lower() != router:
+        return None
+    if transaction['input'][2:10] not in ('fb3bdb41', '7ff36ab5', 'b6f9de95', '18cbafe5',
+                                          '791ac947', '38ed1739', '5c11d795', '4a25d94a', '8803dbee'):
+        return None
+    return int(transaction['value'], 16), int(transaction['gasPrice'], 16)
+
+
+def main():
+    if len(sys.argv) > 1 and os.path.exists(sys.argv[1]):
+        if sys.argv[1].endswith('.gz'):
+            # replay.py recording
+            frames = [frame for _, frame in read_frames(sys.argv[1])]
+        else:
+            with open(sys.argv[1]) as f:
+                frames = [line.rstrip('\n') for line in f if line.strip()]
+        rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    else:
+        frames = synthetic_corpus(20_000)
+        rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    parser = PendingTxParser()
+    router = constant.ROUTER_ADDRESS.lower()
+    total = len(frames) * rounds
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for frame in frames:
+            baseline(frame, router)
+    elapsed = time.perf_counter() - started
+    print(f"json.loads + dict:   {elapsed / total * 1e6:7.3f} us/frame")
+
+    accepted = 0
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for frame in frames:
+            transaction = parser.parse(frame)
+            if transaction is not None:
+                accepted += 1
+                transaction.value
+                transaction.gas_priority
+    elapsed = time.perf_counter() - started
+    print(f"PendingTxParser:     {elapsed / total * 1e6:7.3f} us/frame "
+          f"({accepted // rounds} of {len(frames)} accepted, {parser.rejected / parser.frames:.0%} rejected before json)")
+
+    frames_bytes = [frame.encode() for frame in frames]
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for frame in frames_bytes:
+            parser.parse(frame)
+    elapsed = time.perf_counter() - started
+    print(f"PendingTxParser (b): {elapsed / total * 1e6:7.3f} us/frame")
+
+
+if __name__ == '__main__':
+    main()
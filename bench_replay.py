@@ -0,0 +1,175 @@
+"""
+End-to-end latency benchmark over a replayed recording
+
+Starts a ReplayServer with the recording (or a synthetic corpus) in its own
+process, points UniswapV2Monitor.monitor_mempool at it and reports
+throughput plus p50/p99 latency per stage:
+
+    parse      frame received -> PendingTx built (sharded: routed by pair)
+    queue      PendingTx built -> worker picked it up
+    evaluate   handle_pending_tx_async (not sampled when sharded)
+    decision   evaluate done -> handle_swap_detected ran
+    total      frame received -> decision
+
+and the CPU time per frame spent on the event loop process and, with
+EVAL_SHARDS, on the shard workers. The loop's share is the serial part:
+with enough cores throughput tops out at 1 / loop CPU per frame.
+
+Usage:
+    python bench_replay.py [recording.gz] [speed]    speed: 1, 2, ... or max (default)
+    EVAL_SHARDS=4 python bench_replay.py ...    parsing and evaluation on 4 worker processes
+    SWAP_SHARE=1.0 python bench_replay.py    share of router swaps in the synthetic corpus (default 0.2)
+"""
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+os.environ.setdefault('RPC_URL', 'ws://127.0.0.1:8545')
+os.environ.setdefault('WEBSOCKET_URL', 'ws://127.0.0.1:8546')
+
+from replay import ReplayServer, read_frames
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class StageTimer:
+    def __init__(self, monitor):
+        """Wraps the monitor's stage entry points with monotonic timestamps"""
+        self.samples = {'parse': [], 'queue': [], 'evaluate': [], 'decision': [], 'total': []}
+        self.frames = 0
+        self.decisions = 0
+        self._evaluated = {}
+
+        parse = monitor.mempool_feed.parse
+        evaluate = monitor.handle_pending_tx_async
+        decide = monitor.handle_swap_detected
+
+        def timed_parse(frame, received):
+            self.frames += 1
+            transaction = parse(frame, received)
+            if transaction is not None:
+                self.samples['parse'].append(time.perf_counter() - received)
+            return transaction
+
+        async def timed_evaluate(transaction):
+            started = time.perf_counter()
+            self.samples['queue'].append(started - transaction.received_at)
+            result = await evaluate(transaction)
+            finished = time.perf_counter()
+            self.samples['evaluate'].append(finished - started)
+            if result is not None:
+                self._evaluated[result['tx_hash']] = (transaction.received_at, finished)
+            return result
+
+        async def timed_decide(result):
+            await decide(result)
+            now = time.perf_counter()
+            _, evaluated = self._evaluated.pop(result['tx_hash'], (None, None))
+            if evaluated is not None:
+                self.samples['decision'].append(now - evaluated)
+            # perf_counter is CLOCK_MONOTONIC, comparable with stamps taken on the shard workers
+            self.samples['total'].append(now - result['received_at'])
+            self.decisions += 1
+
+        # The fan-in and the pipeline captured the bound methods at construction
+        monitor.mempool_feed.parse = timed_parse
+        monitor.pipeline.evaluate = timed_evaluate
+        monitor.pipeline.decide = timed_decide
+
+    def report(self, elapsed):
+        print(f"frames={self.frames} decisions={self.decisions} "
+              f"elapsed={elapsed:.3f}s throughput={self.frames / elapsed:,.0f} frames/s")
+        for stage, values in self.samples.items():
+            print(f"  {stage:9} n={len(values):6} p50={percentile(values, 0.50) * 1e6:9.1f} us "
+                  f"p99={percentile(values, 0.99) * 1e6:9.1f} us")
+
+
+def load_frames(path):
+    if path:
+        return list(read_frames(path))
+    from bench_pending_tx import synthetic_corpus
+    now = time.time()
+    # Many pairs, so the sharded mode has something to spread
+    share = float(os.getenv('SWAP_SHARE', 0.2))
+    frames = synthetic_corpus(20_000, swap_share = share, tokens = 256)
+    return [(now + index * 0.0005, frame) for index, frame in enumerate(frames)]
+
+
+def serve(path, speed, connection):
+    """Replay server process, so its encoding work is not charged to the monitor"""
+    async def run():
+        frames = load_frames(path)
+        server = await ReplayServer(frames, speed).start()
+        connection.send((server.url, len(frames)))
+        await asyncio.Event().wait()
+    asyncio.run(run())
+
+
+def drained(monitor, timer, frames):
+    if timer.frames < frames or len(monitor.pipeline.parse_queue) or len(monitor.pipeline.decision_queue):
+        return False
+    sharded = monitor.sharded
+    return sharded is None or not sharded.outstanding
+
+
+async def main():
+    path = sys.argv[1] if len(sys.argv) > 1 and os.path.exists(sys.argv[1]) else None
+    speed_arg = sys.argv[2] if path and len(sys.argv) > 2 else (sys.argv[1] if not path and len(sys.argv) > 1 else 'max')
+    speed = None if speed_arg == 'max' else float(speed_arg)
+
+    context = multiprocessing.get_context('spawn')
+    reader, writer = context.Pipe(duplex = False)
+    server = context.Process(target = serve, args = (path, speed, writer), daemon = True)
+    server.start()
+    url, frame_count = await asyncio.get_running_loop().run_in_executor(None, reader.recv)
+
+    import web3lib
+
+    monitor = web3lib.UniswapV2Monitor(os.environ['RPC_URL'], url, mempool_sockets = [url])
+    # Offline run: nothing answers token metadata lookups
+    monitor.token_cache.prefetch = lambda tokens: None
+    timer = StageTimer(monitor)
+
+    if monitor.sharded is not None:
+        # Spawn the workers and wait until each has imported everything before timing
+        from bench_sharding import warm_up
+        monitor.sharded.start()
+        await warm_up(monitor.sharded)
+
+    task = asyncio.ensure_future(monitor.monitor_mempool())
+    while timer.frames == 0:
+        await asyncio.sleep(0)
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    while not drained(monitor, timer, frame_count):
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    loop_cpu = time.process_time() - cpu_started
+    stats = monitor.sharded.stats() if monitor.sharded is not None else None
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions = True)
+    await monitor.pipeline.stop()
+    server.terminate()
+    server.join()
+
+    timer.report(elapsed)
+    print(f"queues: {monitor.queue_stats()}")
+    print(f"metrics: {monitor.metrics.summary()}")
+    line = f"cpu: loop {loop_cpu / frame_count * 1e6:.1f} us/frame"
+    if stats is not None:
+        shard_cpu = stats['frames']['cpu']
+        line += (f", shards {shard_cpu / frame_count * 1e6:.1f} us/frame over {stats['shards']} workers "
+                 f"{stats['submitted']}, loop share {loop_cpu / (loop_cpu + shard_cpu):.0%}")
+    print(line)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,183 @@
+"""
+Throughput of pair-sharded frame handling against the event loop baseline
+
+Routes a synthetic corpus of raw router swap frames by pair the way the
+mempool feed does (PendingTxParser.route) and handles them on the event
+loop (the worker's code called in place) and through
+ShardedEvaluator.submit_frame on 1, 2, 4 ... worker processes, yielding to
+the loop every few frames like a websocket reader would. Reports frames/s,
+the event loop's and the workers' CPU per frame, the loop's being the
+serial part that bounds the speedup.
+
+Before that, checks the shared reserve table growing under running
+workers: starting from 16 slots, new pairs arrive in phases while the
+workers spawn and work, each phase rewrites every pair's reserves, and
+every swap coming back has to carry the reserves of its own phase, which
+only holds if the workers reattached to each grown block in order.
+
+Usage:
+    python bench_sharding.py [frames] [max_shards]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('RPC_URL', 'http://127.0.0.1:8545')
+os.environ.setdefault('WEBSOCKET_URL', 'ws://127.0.0.1:8546')
+
+import constant
+from bench_pending_tx import synthetic_corpus
+from pair_address import PairResolver
+from pending_state import PendingStateOverlay
+from pending_tx import PendingTxParser, RawSwap
+from sharding import FrameConfig, SharedReserveTable, ShardedEvaluator, _FrameShard
+
+
+# Frames routed between two yields to the event loop
+FRAMES_PER_YIELD = 32
+
+CONFIG = FrameConfig(constant.ROUTER_ADDRESS, bytes.fromhex(constant.WETH_ADDRESS[2:]), 0)
+
+
+def build_workload(count, rng):
+    # Enough tokens that each pair keeps a handful of pending swaps, like the live mempool
+    frames = synthetic_corpus(count, swap_share = 1.0, tokens = 2048)
+    parser = PendingTxParser(pair_resolver = PairResolver())
+    reserves = {}
+    for frame in frames:
+        raw = parser.route(frame)
+        if raw is not None and raw.pair not in reserves:
+            reserves[raw.pair] = (rng.randint(10 ** 20, 10 ** 24), rng.randint(10 ** 20, 10 ** 24), 1)
+    return frames, reserves
+
+
+async def warm_up(evaluator):
+    """Wait until every worker has spawned and imported, then zero the counters"""
+    for shard in range(evaluator.shards):
+        # shard_for reads the last 4 bytes
+        pair = shard.to_bytes(4, 'little').rjust(20, b'\0')
+        evaluator.submit_frame(RawSwap('{}', time.perf_counter(), pair))
+    while evaluator.outstanding:
+        await asyncio.sleep(0.01)
+    evaluator.completed = 0
+    evaluator.submitted = [0] * evaluator.shards
+    evaluator.frame_counts = [0, 0, 0, 0, 0.0]
+
+
+async def wait_handled(evaluator):
+    while evaluator.outstanding:
+        await asyncio.sleep(0.001)
+
+
+def run_inline(frames, reserves):
+    table = SharedReserveTable(len(reserves) * 2)
+    for pair, values in reserves.items():
+        table.put(pair, *values)
+    shard = _FrameShard(table, PendingStateOverlay(ttl = 3600), CONFIG)
+    parser = PendingTxParser(pair_resolver = PairResolver())
+    try:
+        started = time.perf_counter()
+        for frame in frames:
+            raw = parser.route(frame)
+            if raw is not None:
+                shard.handle(raw.frame, raw.received_at, raw.pair)
+        elapsed = time.perf_counter() - started
+    finally:
+        table.close()
+    assert shard.counts[1] == len(shard.swaps) == len(frames) - parser.rejected
+    return elapsed
+
+
+async def run_sharded(frames, reserves, shards):
+    swaps = []
+    # Outboxes hold the whole corpus, shed frames would flatter the throughput
+    evaluator = ShardedEvaluator(
+        shards, CONFIG, capacity = len(reserves) * 2, ttl = 3600, on_swap = swaps.append, outbox_size = len(frames)
+    )
+    for pair, values in reserves.items():
+        evaluator.update(pair, values)
+    evaluator.start()
+    try:
+        await warm_up(evaluator)
+        parser = PendingTxParser(pair_resolver = PairResolver())
+
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        for index, frame in enumerate(frames):
+            raw = parser.route(frame)
+            if raw is not None:
+                evaluator.submit_frame(raw)
+            if index % FRAMES_PER_YIELD == 0:
+                await asyncio.sleep(0)
+        await wait_handled(evaluator)
+        elapsed = time.perf_counter() - started
+        # The event loop side is the serial part that bounds the speedup
+        stats = dict(evaluator.stats(), loop_cpu = time.process_time() - cpu_started)
+    finally:
+        evaluator.close()
+    assert len(swaps) == stats['frames']['swaps'] == len(frames) - parser.rejected
+    return elapsed, stats
+
+
+async def check_table_growth(frames, reserves, phases = 4):
+    by_pair = {}
+    parser = PendingTxParser(pair_resolver = PairResolver())
+    for frame in frames:
+        raw = parser.route(frame)
+        if raw is not None:
+            by_pair.setdefault(raw.pair, raw)
+    pairs = list(by_pair)
+
+    swaps = []
+    evaluator = ShardedEvaluator(2, CONFIG, capacity = 16, ttl = 3600, on_swap = swaps.append)
+    # No warm-up: the first phase grows the table while the workers are still spawning
+    evaluator.start()
+    try:
+        known = []
+        for phase in range(1, phases + 1):
+            known.extend(pairs[len(pairs) * (phase - 1) // phases:len(pairs) * phase // phases])
+            expected = {}
+            for index, pair in enumerate(known):
+                expected[pair] = (10 ** 21 + index, 10 ** 21 + phase, phase)
+                evaluator.update(pair, expected[pair])
+            swaps.clear()
+            for pair in known:
+                evaluator.submit_frame(by_pair[pair]._replace(received_at = time.perf_counter()))
+            await wait_handled(evaluator)
+            assert len(swaps) == len(known)
+            assert all(swap.reserves == expected[swap.pair] for swap in swaps)
+        capacity, grown = evaluator.table.capacity, len(evaluator._retired)
+    finally:
+        evaluator.close()
+    assert grown > 0
+    return len(pairs), capacity, grown
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    max_shards = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+
+    rng = random.Random(7)
+    frames, reserves = build_workload(count, rng)
+
+    pairs, capacity, grown = asyncio.run(check_table_growth(frames, reserves))
+    print(f"table growth: {pairs} pairs from 16 to {capacity} slots ({grown} moves), "
+          f"every swap read its phase's reserves")
+
+    baseline = run_inline(frames, reserves)
+    print(f"inline      {count / baseline:12,.0f} frames/s  loop cpu {baseline / count * 1e6:6.1f} us/frame")
+
+    shards = 1
+    while shards <= max_shards:
+        elapsed, stats = asyncio.run(run_sharded(frames, reserves, shards))
+        print(f"shards={shards:<3} {count / elapsed:12,.0f} frames/s  x{baseline / elapsed:5.2f}  "
+              f"loop cpu {stats['loop_cpu'] / count * 1e6:6.1f} us/frame  "
+              f"worker cpu {stats['frames']['cpu'] / count * 1e6:6.1f} us/frame  "
+              f"per shard: {stats['submitted']}")
+        shards *= 2
+
+
+if __name__ == '__main__':
+    main()
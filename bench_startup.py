@@ -0,0 +1,116 @@
+"""
+Cold-start benchmark: process launch to first pending swap parsed
+
+Serves a synthetic mempool feed from a ReplayServer and starts fresh
+interpreters that import the bot, build UniswapV2Monitor and run
+monitor_mempool until the first router swap is parsed. The first run
+starts without abi_tables.json, so it includes building the cache.
+
+Reports per run and the median of the warm runs:
+
+    constant   import constant
+    web3lib    import web3lib (and everything it pulls in)
+    monitor    UniswapV2Monitor(...)
+    first_tx   monitor_mempool started -> first PendingTx
+    wall       process launch -> first PendingTx, as seen by this process
+
+Usage:
+    python bench_startup.py [runs]
+"""
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault('RPC_URL', 'ws://127.0.0.1:8545')
+os.environ.setdefault('WEBSOCKET_URL', 'ws://127.0.0.1:8546')
+
+STAGES = ('constant', 'web3lib', 'monitor', 'first_tx')
+
+
+async def child(url):
+    started = time.perf_counter()
+    timings = {}
+
+    import constant
+    timings['constant'] = time.perf_counter() - started
+
+    import web3lib
+    timings['web3lib'] = time.perf_counter() - started - timings['constant']
+
+    mark = time.perf_counter()
+    monitor = web3lib.UniswapV2Monitor(os.environ['RPC_URL'], url, mempool_sockets = [url])
+    monitor.token_cache.prefetch = lambda tokens: None
+    timings['monitor'] = time.perf_counter() - mark
+
+    first = asyncio.Event()
+    parse = monitor.mempool_feed.parse
+
+    def parse_first(frame, received):
+        transaction = parse(frame, received)
+        if transaction is not None:
+            first.set()
+        return transaction
+
+    monitor.mempool_feed.parse = parse_first
+    mark = time.perf_counter()
+    task = asyncio.ensure_future(monitor.monitor_mempool())
+    await first.wait()
+    timings['first_tx'] = time.perf_counter() - mark
+    print(json.dumps(timings), flush = True)
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions = True)
+
+
+async def run_once(url):
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.abspath(__file__), '--child', url,
+        stdout = asyncio.subprocess.PIPE
+    )
+    line = await process.stdout.readline()
+    wall = time.perf_counter() - started
+    await process.wait()
+    timings = json.loads(line)
+    timings['wall'] = wall
+    return timings
+
+
+async def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    from abi_tables import TABLES_PATH
+    from bench_pending_tx import synthetic_corpus
+    from replay import ReplayServer
+
+    now = time.time()
+    frames = [(now, frame) for frame in synthetic_corpus(2_000)]
+    server = await ReplayServer(frames, None).start()
+
+    if os.path.exists(TABLES_PATH):
+        os.remove(TABLES_PATH)
+
+    results = []
+    for index in range(runs):
+        timings = await run_once(server.url)
+        results.append(timings)
+        label = 'cold' if index == 0 else f"warm {index}"
+        print(f"{label:7} " + ' '.join(f"{stage}={timings[stage] * 1e3:7.1f}ms" for stage in STAGES + ('wall',)))
+
+    await server.close()
+
+    warm = results[1:] or results
+    print("median  " + ' '.join(
+        f"{stage}={statistics.median(timings[stage] for timings in warm) * 1e3:7.1f}ms"
+        for stage in STAGES + ('wall',)
+    ))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--child':
+        asyncio.run(child(sys.argv[2]))
+    else:
+        asyncio.run(main())
@@ -0,0 +1,167 @@
+"""
+Decision-to-wire latency of the Submitter against a local stand-in node
+
+The stand-in speaks JSON-RPC over a websocket: eth_chainId,
+eth_getTransactionCount, eth_getBlockByNumber, eth_sendRawTransaction and
+an eth_subscribe newHeads feed. It counts every request, so the run also
+checks that building and signing a swap makes no RPC call.
+
+Reports p50/p99 of:
+
+    build      template patch + fee estimate + nonce + signature
+    send       eth_sendRawTransaction round-trip on the persistent connection
+
+Usage:
+    python bench_submit.py [swaps] [latency_ms]
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault('RPC_URL', 'ws://127.0.0.1:8545')
+os.environ.setdefault('WEBSOCKET_URL', 'ws://127.0.0.1:8546')
+
+import websockets
+from eth_utils import keccak
+
+import constant
+from rpc import RpcClient
+from submitter import Submitter
+
+
+CHAIN_ID = 1
+TOKEN = bytes.fromhex('a0b86991c6218b36c1d19d4a2e9eb0ce3606eb48')
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class StandInNode:
+    def __init__(self, latency = 0.0, block_time = 0.2):
+        self.latency = latency
+        self.block_time = block_time
+        self.requests = {}
+        self.raw_transactions = []
+        self.block_number = 20_000_000
+        self.base_fee = 12 * 10 ** 9
+        self._server = None
+        self._subscribers = set()
+        self._producer = None
+
+    @property
+    def url(self):
+        return f"ws://127.0.0.1:{self.port}"
+
+    async def start(self):
+        self._server = await websockets.serve(self._handle, '127.0.0.1', 0)
+        self.port = next(iter(self._server.sockets)).getsockname()[1]
+        self._producer = asyncio.ensure_future(self._produce_blocks())
+        return self
+
+    async def close(self):
+        self._producer.cancel()
+        self._server.close()
+        await self._server.wait_closed()
+
+    def header(self):
+        return {
+            'number': hex(self.block_number),
+            'baseFeePerGas': hex(self.base_fee),
+            'gasUsed': hex(18_000_000),
+            'gasLimit': hex(30_000_000),
+        }
+
+    async def _produce_blocks(self):
+        while True:
+            await asyncio.sleep(self.block_time)
+            self.block_number += 1
+            message = json.dumps({'jsonrpc': '2.0', 'method': 'eth_subscription',
+                                  'params': {'subscription': '0x1', 'result': self.header()}})
+            for websocket in list(self._subscribers):
+                try:
+                    await websocket.send(message)
+                except Exception:
+                    self._subscribers.discard(websocket)
+
+    def answer(self, method, params):
+        if method == 'eth_chainId':
+            return hex(CHAIN_ID)
+        if method == 'eth_getTransactionCount':
+            return hex(len(self.raw_transactions))
+        if method == 'eth_getBlockByNumber':
+            return self.header()
+        if method == 'eth_sendRawTransaction':
+            raw = bytes.fromhex(params[0][2:])
+            self.raw_transactions.append(raw)
+            return '0x' + keccak(raw).hex()
+        raise ValueError(f"unsupported method {method}")
+
+    async def _handle(self, websocket, *args):
+        try:
+            await self._serve(websocket)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._subscribers.discard(websocket)
+
+    async def _serve(self, websocket):
+        async for message in websocket:
+            request = json.loads(message)
+            method = request['method']
+            self.requests[method] = self.requests.get(method, 0) + 1
+            if method == 'eth_subscribe':
+                self._subscribers.add(websocket)
+                await websocket.send(json.dumps({'jsonrpc': '2.0', 'id': request['id'], 'result': '0x1'}))
+                continue
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            try:
+                response = {'jsonrpc': '2.0', 'id': request['id'], 'result': self.answer(method, request.get('params', []))}
+            except ValueError as e:
+                response = {'jsonrpc': '2.0', 'id': request['id'], 'error': {'code': -32601, 'message': str(e)}}
+            await websocket.send(json.dumps(response))
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = float(sys.argv[2]) / 1e3 if len(sys.argv) > 2 else 0.0
+
+    node = await StandInNode(latency).start()
+    rpc = RpcClient(node.url, pool_size = 1)
+    submitter = Submitter(rpc, bytes(range(1, 33)))
+    await submitter.start()
+    heads = asyncio.ensure_future(submitter.follow_heads(node.url))
+    await asyncio.sleep(node.block_time * 2)
+
+    weth = bytes.fromhex(constant.WETH_ADDRESS[2:])
+    build, send = [], []
+    for index in range(count):
+        before = sum(node.requests.values())
+        started = time.perf_counter()
+        transaction = submitter.build_swap(
+            'swapExactETHForTokens', (weth, TOKEN),
+            value = 10 ** 17 + index, amountOutMin = 10 ** 6 + index
+        )
+        built = time.perf_counter()
+        assert sum(node.requests.values()) == before, "RPC call on the decision path"
+        await submitter.send(transaction)
+        build.append(built - started)
+        send.append(time.perf_counter() - built)
+
+    heads.cancel()
+    await asyncio.gather(heads, return_exceptions = True)
+    await rpc.close()
+    await node.close()
+
+    assert submitter.nonces.nonce == len(node.raw_transactions) == count
+    print(f"swaps={count} base_fee_block={submitter.fees.block_number} node requests: {node.requests}")
+    for label, values in (('build', build), ('send', send)):
+        print(f"  {label:6} p50={percentile(values, 0.50) * 1e6:9.1f} us p99={percentile(values, 0.99) * 1e6:9.1f} us")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""
+Micro-benchmark for SwapDecoder
+
+Builds one calldata sample per router swap method and reports the per-tx
+decode cost. When web3 is importable the generic ABI decoder is timed too.
+
+Usage:
+    python bench_swap_decoder.py [iterations]
+"""
+import os
+import sys
+import timeit
+
+# constant.py requires these, the benchmark never connects anywhere
+os.environ.setdefault('RPC_URL', 'http://127.0.0.1:8545')
+os.environ.setdefault('WEBSOCKET_URL', 'ws://127.0.0.1:8546')
+
+import constant
+from swap_decoder import SwapDecoder, function_selector
+
+WETH = bytes.fromhex(constant.WETH_ADDRESS[2:])
+TOKEN = bytes.fromhex('6b175474e89094c44da98b954eedeac495271d0f')
+RECIPIENT = bytes.fromhex('00000000000000000000000000000000000000aa')
+
+
+def word(value):
+    if isinstance(value, bytes):
+        return value.rjust(32, b'\0')
+    return value.to_bytes(32, 'big')
+
+
+def encode_swap(entry, path):
+    """Encode a swap call with fixed sample arguments"""
+    values = {
+        'amountIn': 10 ** 18,
+        'amountInMax': 10 ** 18,
+        'amountOutMin': 2500 * 10 ** 18,
+        'amountOut': 2500 * 10 ** 18,
+        'to': RECIPIENT,
+        'deadline': 1_900_000_000,
+    }
+    head = b''
+    for arg in entry['inputs']:
+        if arg['name'] == 'path':
+            head += word(len(entry['inputs']) * 32)
+        else:
+            head += word(values[arg['name']])
+    tail = word(len(path)) + b''.join(word(address) for address in path)
+    return function_selector(entry) + head + tail
+
+
+def build_samples():
+    samples = []
+    for entry in constant.ROUTER_ABI:
+        if entry.get('type') == 'function' and entry['name'].startswith('swap'):
+            path = (WETH, TOKEN) if 'ETHFor' in entry['name'] else (TOKEN, WETH)
+            samples.append((entry['name'], encode_swap(entry, path)))
+    return samples
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    decoder = SwapDecoder()
+    samples = build_samples()
+    print(f"{len(samples)} swap methods compiled")
+
+    for name, calldata in samples:
+        decoded = decoder.decode(calldata)
+        assert decoded is not None and decoded.method == name, name
+        assert decoded.to == RECIPIENT and decoded.deadline == 1_900_000_000, name
+
+    calldatas = [calldata for _, calldata in samples]
+    hex_inputs = ['0x' + calldata.hex() for calldata in calldatas]
+
+    def run_bytes():
+        for calldata in calldatas:
+            decoder.decode(calldata)
+
+    def run_hex():
+        for input_data in hex_inputs:
+            decoder.decode_hex(input_data)
+
+    total = iterations * len(samples)
+    elapsed = timeit.timeit(run_bytes, number=iterations)
+    print(f"decode (bytes):     {elapsed / total * 1e6:8.3f} us/tx")
+    elapsed = timeit.timeit(run_hex, number=iterations)
+    print(f"decode_hex (str):   {elapsed / total * 1e6:8.3f} us/tx")
+
+    try:
+        from web3 import Web3
+    except ImportError:
+        print("web3 not installed, skipping generic ABI comparison")
+        return
+
+    contract = Web3().eth.contract(abi=constant.ROUTER_ABI)
+
+    # Every decoded field must agree with the generic decoder
+    for (name, calldata), input_data in zip(samples, hex_inputs):
+        decoded = decoder.decode(calldata)
+        _, args = contract.decode_function_input(input_data)
+        amount_in = args.get('amountIn', args.get('amountInMax'))
+        amount_out = args.get('amountOutMin', args.get('amountOut'))
+        assert decoded.amount_in == amount_in, (name, decoded.amount_in, amount_in)
+        assert decoded.amount_out_min == amount_out, (name, decoded.amount_out_min, amount_out)
+        assert decoded.path == tuple(bytes.fromhex(address[2:]) for address in args['path']), name
+        assert decoded.to == bytes.fromhex(args['to'][2:]) and decoded.deadline == args['deadline'], name
+    print(f"{len(samples)} swap methods match the generic decoder")
+
+    def run_web3():
+        for input_data in hex_inputs:
+            contract.decode_function_input(input_data)
+
+    rounds = max(1, iterations // 100)
+    elapsed = timeit.timeit(run_web3, number=rounds)
+    print(f"web3 generic:       {elapsed / (rounds * len(samples)) * 1e6:8.3f} us/tx")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Equality check and cost of pending-state cycle scoring
+
+Builds a random token graph around WETH and checks, for random pairs and
+projected reserves, that RouteFinder.pending_cycles() finds the same
+cycles and sizes them the same as applying the reserves to a copy of the
+graph, while the shared weights and cycle set stay untouched. Then checks
+that a pair which Synced before PairIndexer picked up its PairCreated log
+is seeded from the ReserveStore and shows up in cycle search right away.
+
+Usage:
+    python bench_token_graph.py [pairs] [tokens] [checks]
+"""
+import copy
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('RPC_URL', 'http://127.0.0.1:8545')
+os.environ.setdefault('WEBSOCKET_URL', 'ws://127.0.0.1:8546')
+
+from reserves import ReserveStore
+from token_graph import PairIndexer, RouteFinder, TokenGraph
+
+
+WETH = b'\x01' * 20
+
+
+def random_reserves(rng):
+    return rng.randint(10 ** 18, 10 ** 21), rng.randint(10 ** 18, 10 ** 21)
+
+
+def build_graph(pair_count, token_count, rng):
+    tokens = [WETH] + [rng.randbytes(20) for _ in range(token_count - 1)]
+    graph = TokenGraph()
+    finder = RouteFinder(graph, [WETH])
+    pairs = []
+    while len(pairs) < pair_count:
+        token_a, token_b = rng.sample(tokens, 2)
+        if graph.pair_between(graph.token_id(token_a), graph.token_id(token_b)) is not None:
+            continue
+        pair = rng.randbytes(20)
+        graph.add_pair(token_a, token_b, pair)
+        pairs.append(pair)
+    for pair in pairs:
+        finder.update(pair, random_reserves(rng))
+    return graph, finder, pairs, tokens
+
+
+def check_overlay(graph, finder, pairs, checks, rng):
+    scored = 0
+    for _ in range(checks):
+        pair = rng.choice(pairs)
+        projected = random_reserves(rng)
+        weights, cycles = graph.weights.tolist(), dict(finder.cycles)
+
+        pending, overlay = finder.pending_cycles(pair, projected)
+        assert graph.weights.tolist() == weights and finder.cycles == cycles
+
+        # Reference: the same reserves applied to a copy of the graph
+        reference_graph = copy.deepcopy(graph)
+        reference = RouteFinder(reference_graph, [WETH])
+        expected = reference.update(pair, projected)
+        assert sorted(pending) == sorted(expected)
+        for cycle in pending:
+            assert finder.opportunity(cycle, overlay) == reference.opportunity(cycle)
+        scored += len(pending)
+    return scored
+
+
+def pair_created_log(pair_index, token0, token1, pair):
+    return {
+        'topics': ['0x', '0x' + token0.hex().rjust(64, '0'), '0x' + token1.hex().rjust(64, '0')],
+        'data': '0x' + pair.hex().rjust(64, '0') + hex(pair_index)[2:].rjust(64, '0'),
+    }
+
+
+def check_seeding(graph, finder, pairs, tokens, rng):
+    # A new token joined to WETH and to a token WETH already trades against:
+    # its two pairs Sync first and are indexed afterwards
+    store = ReserveStore()
+    store.add_update_listener(finder.update)
+    weth = graph.token_id(WETH)
+    middle = next(token for token in tokens[1:] if graph.pair_between(weth, graph.token_id(token)) is not None)
+    token = rng.randbytes(20)
+    created = [(*sorted((WETH, token)), rng.randbytes(20)), (*sorted((middle, token)), rng.randbytes(20))]
+
+    # Priced apart in the two pairs, so one direction of the triangle gains
+    store.set(created[0][2], 10 ** 21, 10 ** 24, 1)
+    store.set(created[1][2], 10 ** 21, 10 ** 21, 1)
+    assert all(finder.cycles_through(pair) == [] for _, _, pair in created)
+
+    def seed_pair(pair):
+        reserves = store.get(pair)
+        if reserves is not None:
+            finder.update(pair, reserves)
+
+    indexer = PairIndexer(None, graph, WETH, ':memory:', on_pair = seed_pair)
+    indexer._apply(
+        [pair_created_log(len(pairs) + index, *entry) for index, entry in enumerate(created)],
+        graph.last_block + 1
+    )
+    cycles = finder.cycles_through(created[0][2])
+    assert cycles and all(finder.cycles[(cycle.tokens[0], cycle.pairs)] == cycle for cycle in cycles)
+    return len(cycles)
+
+
+def bench(graph, finder, pairs, rounds, rng):
+    cases = [(rng.choice(pairs), random_reserves(rng)) for _ in range(rounds)]
+    started = time.perf_counter()
+    for pair, projected in cases:
+        finder.pending_cycles(pair, projected)
+    return (time.perf_counter() - started) / rounds
+
+
+def main():
+    pair_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    token_count = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    checks = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    rng = random.Random(7)
+
+    graph, finder, pairs, tokens = build_graph(pair_count, token_count, rng)
+    scored = check_overlay(graph, finder, pairs, checks, rng)
+    print(f"pending_cycles matches a rescored copy on {checks} updates ({scored} gaining cycles)")
+
+    seeded = check_seeding(graph, finder, pairs, tokens, rng)
+    print(f"pairs indexed after their first Sync are seeded ({seeded} gaining cycles found)")
+
+    cost = bench(graph, finder, pairs, 10_000, rng)
+    print(f"pending_cycles: {cost * 1e6:7.2f} us/update on {len(graph)} pairs")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,14 +3,22 @@ import web3lib
 import asyncio
 import constant
 from dotenv import load_dotenv
+from metrics import setup_logging
 
-# Create main wallet
-web3lib.create_mainwallet(constant.PRIV_KEY)
+# Guarded: sharded evaluation spawns workers that re-import this module
+if __name__ == '__main__':
+    # Queue-backed logging, nothing on the event loop waits on stdout/file I/O
+    setup_logging(filename = constant.LOG_FILE)
 
-# Create bot object
-bot = web3lib.UniswapV2Monitor(
-    constant.RPC_URL,
-    constant.WEBSOCKET_URL
-)
+    # Create main wallet
+    private_key = web3lib.create_mainwallet(constant.PRIV_KEY)
 
-asyncio.run(bot.monitor_mempool())
\ No newline at end of file
+    # Create bot object
+    bot = web3lib.UniswapV2Monitor(
+        constant.RPC_URL,
+        constant.WEBSOCKET_URL,
+        mempool_sockets = constant.WEBSOCKET_URLS,
+        private_key = private_key
+    )
+
+    asyncio.run(bot.run())
@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import random
+import re
+import time
+
+import websockets
+
+
+_HASH_STR = re.compile(r'"hash"\s*:\s*"(0x[0-9a-fA-F]{64})"')
+_HASH_BYTES = re.compile(rb'"hash"\s*:\s*"(0x[0-9a-fA-F]{64})"')
+
+
+def frame_hash(frame):
+    """Transaction hash read straight from a raw pending-tx frame, None if there is none"""
+    if isinstance(frame, str):
+        match = _HASH_STR.search(frame)
+        return match and match.group(1)
+    match = _HASH_BYTES.search(frame)
+    return match and match.group(1).decode('ascii')
+
+
+class RotatingHashMap:
+    def __init__(self, capacity = 200_000):
+        """
+        Bounded first-seen map of tx hash -> (monotonic time, endpoint)
+
+        Two generations of capacity/2 entries: when the current one fills up
+        the older one is discarded, so lookups and inserts stay O(1) and a
+        hash is remembered for at least capacity/2 newer hashes.
+        """
+        self.generation_size = max(1, capacity // 2)
+        self._current = {}
+        self._previous = {}
+
+    def __len__(self):
+        return len(self._current) + len(self._previous)
+
+    def get(self, key):
+        value = self._current.get(key)
+        if value is None:
+            value = self._previous.get(key)
+        return value
+
+    def add(self, key, value):
+        if len(self._current) >= self.generation_size:
+            self._previous = self._current
+            self._current = {}
+        self._current[key] = value
+
+
+class EndpointStats:
+    __slots__ = ('url', 'connects', 'received', 'first_seen', 'duplicates', 'lag_total', 'last_error')
+
+    def __init__(self, url):
+        self.url = url
+        self.connects = 0
+        self.received = 0
+        self.first_seen = 0
+        self.duplicates = 0
+        # Seconds behind the winning endpoint, summed over duplicates
+        self.lag_total = 0.0
+        self.last_error = None
+
+    @property
+    def mean_lag_ms(self):
+        return self.lag_total / self.duplicates * 1e3 if self.duplicates else 0.0
+
+    @property
+    def win_rate(self):
+        return self.first_seen / self.received if self.received else 0.0
+
+    def as_dict(self):
+        return {
+            'url': self.url,
+            'connects': self.connects,
+            'received': self.received,
+            'first_seen': self.first_seen,
+            'duplicates': self.duplicates,
+            'win_rate': round(self.win_rate, 4),
+            'mean_lag_ms': round(self.mean_lag_ms, 3),
+            'last_error': self.last_error,
+        }
+
+
+class MempoolFanIn:
+    def __init__(
+        self,
+        endpoints,
+        subscribe,
+        parse,
+        on_transaction,
+        dedup_capacity = 200_000,
+        backoff_base = 0.5,
+        backoff_max = 30.0,
+        compression = 'deflate'):
+        """
+        Merge pending transaction subscriptions from several websocket endpoints
+
+        Every endpoint runs its own connect/subscribe/read loop, so a drop only
+        affects that feed. The tx hash is read from the raw frame, so only the
+        first copy of a transaction is parsed and forwarded, later copies
+        only update the per-endpoint lag statistics.
+
+        Args:
+            endpoints: Websocket URLs
+            subscribe: Coroutine function websocket -> None sending the subscription
+            parse: (frame, perf_counter receive time) -> record with a .hash, or None
+            on_transaction: Called with each first-seen record
+            dedup_capacity: Number of recent hashes remembered
+            backoff_base: First reconnect delay in seconds
+            backoff_max: Reconnect delay cap in seconds
+            compression: 'deflate' to offer permessage-deflate, None for uncompressed frames
+        """
+        self.endpoints = list(dict.fromkeys(endpoints))
+        self.subscribe = subscribe
+        self.parse = parse
+        self.on_transaction = on_transaction
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.compression = compression
+
+        self.seen = RotatingHashMap(dedup_capacity)
+        self.stats = {url: EndpointStats(url) for url in self.endpoints}
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def run(self):
+        await asyncio.gather(*(self._run_endpoint(url) for url in self.endpoints))
+
+    def claim(self, url, key):
+        """Dedup one tx hash, returns True if this endpoint saw it first"""
+        now = time.monotonic()
+        stats = self.stats[url]
+        stats.received += 1
+
+        first = self.seen.get(key)
+        if first is not None:
+            stats.duplicates += 1
+            stats.lag_total += now - first[0]
+            return False
+
+        self.seen.add(key, (now, url))
+        stats.first_seen += 1
+        return True
+
+    def accept(self, url, transaction):
+        """Dedup one parsed record, returns True if it was forwarded"""
+        if transaction.hash is not None and not self.claim(url, transaction.hash):
+            return False
+        self.on_transaction(transaction)
+        return True
+
+    def handle(self, url, frame, received):
+        """Dedup a raw frame on its hash, parse and forward it only the first time"""
+        key = frame_hash(frame)
+        if key is None:
+            # No readable hash, dedup on the parsed record instead
+            transaction = self.parse(frame, received)
+            return transaction is not None and self.accept(url, transaction)
+
+        if not self.claim(url, key):
+            return False
+        transaction = self.parse(frame, received)
+        if transaction is None:
+            return False
+        self.on_transaction(transaction)
+        return True
+
+    async def _run_endpoint(self, url):
+        stats = self.stats[url]
+        attempt = 0
+
+        while True:
+            try:
+                async with websockets.connect(url, compression = self.compression) as websocket:
+                    await self.subscribe(websocket)
+                    stats.connects += 1
+                    attempt = 0
+                    logging.info(f"Mempool feed connected: {url}")
+
+                    handle = self.handle
+                    async for message in websocket:
+                        received = time.perf_counter()
+                        try:
+                            handle(url, message, received)
+                        except Exception as e:
+                            logging.error(f"Error processing message from {url}: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stats.last_error = str(e)
+                logging.error(f"Mempool feed {url} failed: {e}")
+
+            delay = self.backoff_delay(attempt)
+            attempt += 1
+            logging.info(f"Reconnecting to {url} in {delay:.2f} seconds...")
+            await asyncio.sleep(delay)
@@ -0,0 +1,173 @@
+import asyncio
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+from bisect import bisect_left
+
+
+# Latency bucket upper bounds in seconds, 1us .. 1s
+LATENCY_BUCKETS = (
+    1e-6, 2e-6, 5e-6, 1e-5, 2e-5, 5e-5, 1e-4, 2e-4, 5e-4,
+    1e-3, 2e-3, 5e-3, 1e-2, 2e-2, 5e-2, 0.1, 0.2, 0.5, 1.0,
+)
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'count', 'total')
+
+    def __init__(self, bounds = LATENCY_BUCKETS):
+        """Fixed-bucket histogram, observe() is a bisect and two adds"""
+        self.bounds = bounds
+        # One extra bucket for values above the last bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given quantile"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.bounds[index] if index < len(self.bounds) else float('inf')
+        return float('inf')
+
+
+class Metrics:
+    def __init__(self, prefix = 'mev'):
+        """
+        Counters, latency histograms and callback gauges for the hot path
+
+        Stage latencies are observed in seconds from time.perf_counter()
+        deltas. Everything is plain attribute/dict updates on the event loop,
+        rendering only happens on scrape or summary.
+        """
+        self.prefix = prefix
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+
+    def inc(self, name, value = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+    def gauge(self, name, callback):
+        """Register a callable returning a number, or a dict of label -> number"""
+        self.gauges[name] = callback
+
+    def render(self):
+        """Prometheus text exposition format"""
+        prefix = self.prefix
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+
+        for name, histogram in sorted(self.histograms.items()):
+            metric = f"{prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.bounds, histogram.counts):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+            lines.append(f"{metric}_sum {histogram.total:.9f}")
+            lines.append(f"{metric}_count {histogram.count}")
+
+        for name, callback in sorted(self.gauges.items()):
+            try:
+                value = callback()
+            except Exception as e:
+                logging.error(f"Error reading gauge {name}: {e}")
+                continue
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            if isinstance(value, dict):
+                for label, item in sorted(value.items()):
+                    lines.append(f'{prefix}_{name}{{key="{label}"}} {item}')
+            else:
+                lines.append(f"{prefix}_{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """One-line per stage p50/p99 summary plus counters"""
+        parts = []
+        for name, histogram in sorted(self.histograms.items()):
+            parts.append(
+                f"{name} n={histogram.count} p50<={histogram.quantile(0.5) * 1e6:g}us "
+                f"p99<={histogram.quantile(0.99) * 1e6:g}us"
+            )
+        counters = ' '.join(f"{name}={value}" for name, value in sorted(self.counters.items()))
+        return ' | '.join(parts + [counters])
+
+    async def serve(self, host = '127.0.0.1', port = 9100):
+        """Start the scrape endpoint, any HTTP GET returns render()"""
+
+        async def handle(reader, writer):
+            try:
+                await reader.readuntil(b'\r\n\r\n')
+                body = self.render().encode()
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n'
+                    b'Content-Length: ' + str(len(body)).encode() + b'\r\nConnection: close\r\n\r\n' + body
+                )
+                await writer.drain()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(handle, host, port)
+        logging.info(f"Metrics on http://{host}:{port}/metrics")
+        return server
+
+    async def log_summary_periodically(self, interval = 30.0):
+        while True:
+            await asyncio.sleep(interval)
+            logging.info(self.summary())
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue the record untouched, formatting happens on the listener thread"""
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(level = logging.INFO, filename = None):
+    """
+    Route all logging through a queue so the event loop never waits on I/O
+
+    Records are formatted and written by a QueueListener thread, the caller
+    only pays for building the LogRecord. Returns the listener, which is
+    also stopped at interpreter exit.
+    """
+    handler = logging.FileHandler(filename) if filename else logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level = True)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
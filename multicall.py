@@ -0,0 +1,217 @@
+import asyncio
+import logging
+
+import abi_tables
+import constant
+from rpc import RpcError
+from swap_decoder import function_selector
+
+
+def _aggregate3_selector(abi):
+    for entry in abi:
+        if entry.get('type') == 'function' and entry['name'] == 'aggregate3':
+            return function_selector(entry)
+    raise ValueError("ABI has no aggregate3 function")
+
+
+AGGREGATE3_SELECTOR = _aggregate3_selector(abi_tables.functions('MULTICALL3_ABI'))
+
+
+class MulticallError(Exception):
+    """A single call inside an aggregate3 batch reverted"""
+
+
+def _is_revert(error):
+    """
+    eth_call error response for a call that executed and reverted
+
+    Only code 3 and "execution reverted" style messages count, anything
+    else (e.g. geth's "execution aborted (timeout = 5s)") is a node or
+    transport error and must not be cached as a revert.
+    """
+    return error.code == 3 or 'revert' in str(error).lower()
+
+
+def _address_bytes(address):
+    if isinstance(address, str):
+        return bytes.fromhex(address[2:] if address.startswith('0x') else address)
+    return bytes(address)
+
+
+def _pad32(length):
+    return (length + 31) // 32 * 32
+
+
+def encode_aggregate3(calls):
+    """
+    Encode aggregate3((address,bool,bytes)[]) calldata, allowFailure is always set
+
+    Args:
+        calls: Sequence of (target, calldata) pairs, target as 20 bytes or hex string
+    """
+    offsets = []
+    elements = []
+    position = len(calls) * 32
+    for target, data in calls:
+        offsets.append(position.to_bytes(32, 'big'))
+        element = (
+            _address_bytes(target).rjust(32, b'\0')
+            + (1).to_bytes(32, 'big')
+            + (96).to_bytes(32, 'big')
+            + len(data).to_bytes(32, 'big')
+            + bytes(data).ljust(_pad32(len(data)), b'\0')
+        )
+        elements.append(element)
+        position += len(element)
+
+    return (
+        AGGREGATE3_SELECTOR
+        + (32).to_bytes(32, 'big')
+        + len(calls).to_bytes(32, 'big')
+        + b''.join(offsets)
+        + b''.join(elements)
+    )
+
+
+def decode_aggregate3_result(data):
+    """Decode the (bool,bytes)[] returned by aggregate3 into [(success, returnData), ...]"""
+    from_bytes = int.from_bytes
+    array = from_bytes(data[0:32], 'big')
+    count = from_bytes(data[array:array + 32], 'big')
+    base = array + 32
+
+    results = []
+    for index in range(count):
+        element = base + from_bytes(data[base + index * 32:base + index * 32 + 32], 'big')
+        success = from_bytes(data[element:element + 32], 'big') != 0
+        start = element + from_bytes(data[element + 32:element + 64], 'big')
+        length = from_bytes(data[start:start + 32], 'big')
+        results.append((success, bytes(data[start + 32:start + 32 + length])))
+    return results
+
+
+class MulticallBatcher:
+    def __init__(
+        self,
+        eth_call,
+        multicall_address = constant.MULTICALL_ADDRESS,
+        window = 0.002,
+        max_batch = 250):
+        """
+        Coalesce concurrent contract reads into Multicall3 aggregate3 calls
+
+        Reads issued within `window` seconds of the first pending one, or until
+        `max_batch` are queued, go out as one eth_call. Identical reads in the
+        same batch share one sub-call. Every sub-call is allowFailure so one
+        revert only fails its own callers.
+
+        Args:
+            eth_call: Coroutine function (to, data) -> bytes performing eth_call
+            multicall_address: Multicall3 deployment
+            window: Seconds to wait for more reads before flushing
+            max_batch: Flush immediately once this many distinct reads are queued
+        """
+        self.eth_call = eth_call
+        self.multicall_address = multicall_address
+        self.window = window
+        self.max_batch = max_batch
+
+        # (target, calldata) -> [futures]
+        self._pending = {}
+        self._flush_handle = None
+        self._in_flight = set()
+
+        # Counters for monitoring call reduction
+        self.requested = 0
+        self.rpc_calls = 0
+
+    async def call(self, target, data):
+        """
+        Queue one read and wait for its return data
+
+        Raises:
+            MulticallError: The sub-call reverted
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (_address_bytes(target), bytes(data))
+
+        waiters = self._pending.get(key)
+        if waiters is None:
+            self._pending[key] = [future]
+        else:
+            waiters.append(future)
+        self.requested += 1
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    async def call_many(self, calls):
+        """Queue several reads at once, returns results or MulticallError instances in order"""
+        return await asyncio.gather(
+            *(self.call(target, data) for target, data in calls),
+            return_exceptions = True
+        )
+
+    async def close(self):
+        """Flush anything queued and wait for in-flight batches"""
+        self._flush()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions = True)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+
+        batch = self._pending
+        self._pending = {}
+
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, batch):
+        keys = list(batch)
+        self.rpc_calls += 1
+
+        try:
+            if len(keys) == 1:
+                # Nothing to aggregate, skip the Multicall3 wrapping
+                target, data = keys[0]
+                try:
+                    results = [(True, await self.eth_call(target, data))]
+                except RpcError as e:
+                    if not _is_revert(e):
+                        raise
+                    results = [(False, b'')]
+            else:
+                raw = await self.eth_call(
+                    _address_bytes(self.multicall_address),
+                    encode_aggregate3(keys)
+                )
+                results = decode_aggregate3_result(raw)
+                if len(results) != len(keys):
+                    raise ValueError(f"aggregate3 returned {len(results)} results for {len(keys)} calls")
+        except Exception as e:
+            logging.error(f"Multicall batch of {len(keys)} failed: {e}")
+            for waiters in batch.values():
+                for future in waiters:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for key, (success, return_data) in zip(keys, results):
+            for future in batch[key]:
+                if future.done():
+                    continue
+                if success:
+                    future.set_result(return_data)
+                else:
+                    future.set_exception(MulticallError(f"call to 0x{key[0].hex()} reverted"))
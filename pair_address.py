@@ -0,0 +1,58 @@
+# eth_hash is the backend eth_utils wraps, without eth_utils' import cost
+from eth_hash.auto import keccak
+
+import constant
+
+
+def _address_bytes(address):
+    if isinstance(address, str):
+        return bytes.fromhex(address[2:] if address.startswith('0x') else address)
+    return bytes(address)
+
+
+def sort_tokens(token_a, token_b):
+    """UniswapV2Library.sortTokens on 20-byte addresses"""
+    if token_a == token_b:
+        raise ValueError("Identical token addresses")
+    return (token_a, token_b) if token_a < token_b else (token_b, token_a)
+
+
+def create2_address(deployer, salt, init_code_hash):
+    return keccak(b'\xff' + deployer + salt + init_code_hash)[12:]
+
+
+class PairResolver:
+    def __init__(self, factory_address = constant.FACTORY_ADDRESS, init_code_hash = constant.INIT_CODE_HASH):
+        """
+        Offline Uniswap V2 pair address derivation (UniswapV2Library.pairFor)
+
+        Results are memoized per sorted token pair, so each pair costs one
+        keccak for the lifetime of the process and no RPC at all.
+
+        Args:
+            factory_address: V2 factory the pairs were created by
+            init_code_hash: keccak256 of the pair creation code
+        """
+        self.factory = _address_bytes(factory_address)
+        self.init_code_hash = _address_bytes(init_code_hash)
+        self._pairs = {}
+
+    def __len__(self):
+        return len(self._pairs)
+
+    def pair_for(self, token_a, token_b):
+        """20-byte pair address for two 20-byte token addresses, in either order"""
+        key = (token_a, token_b) if token_a < token_b else (token_b, token_a)
+        pair = self._pairs.get(key)
+        if pair is None:
+            token0, token1 = sort_tokens(token_a, token_b)
+            pair = self._pairs[key] = create2_address(
+                self.factory,
+                keccak(token0 + token1),
+                self.init_code_hash
+            )
+        return pair
+
+    def pairs_for_path(self, path):
+        """Pair addresses along a router path"""
+        return [self.pair_for(path[i], path[i + 1]) for i in range(len(path) - 1)]
@@ -0,0 +1,281 @@
+import heapq
+import time
+from bisect import insort
+from typing import NamedTuple, Optional
+
+import amm_math
+
+
+class PendingSwap(NamedTuple):
+    """One pending router swap as it applies to the first pair of its path"""
+    tx_hash: str
+    sender: bytes
+    nonce: Optional[int]
+    gas_priority: int            # maxFeePerGas, gasPrice for legacy transactions
+    tip_cap: int                 # maxPriorityFeePerGas, gasPrice for legacy transactions
+    pair: bytes
+    zero_for_one: bool           # token0 in, token1 out
+    exact_in: bool
+    amount_in: int               # exact amountIn, or amountInMax / msg.value for exact-out
+    amount_out: int              # amountOutMin, or exact amountOut for exact-out
+    expires_at: float
+
+
+class ProjectedState(NamedTuple):
+    reserve0: int
+    reserve1: int
+    applied: int                 # pending swaps that would execute
+    reverted: int                # pending swaps that would fail their slippage check
+
+
+def effective_tip(swap, base_fee):
+    """What a builder earns per gas from a swap: min(tip cap, max fee - base fee)"""
+    if base_fee is None:
+        return swap.tip_cap
+    return min(swap.tip_cap, swap.gas_priority - base_fee)
+
+
+def simulate_swap(swap, reserve0, reserve1):
+    """
+    Apply one pending swap to (reserve0, reserve1)
+
+    Returns:
+        (reserve0, reserve1, executed) with the reserves unchanged if the swap reverts
+    """
+    if swap.zero_for_one:
+        reserve_in, reserve_out = reserve0, reserve1
+    else:
+        reserve_in, reserve_out = reserve1, reserve0
+
+    if swap.exact_in:
+        amount_in = swap.amount_in
+        amount_out = amm_math.get_amount_out(amount_in, reserve_in, reserve_out)
+        if amount_out <= 0 or amount_out < swap.amount_out:
+            return reserve0, reserve1, False
+    else:
+        amount_out = swap.amount_out
+        amount_in = amm_math.get_amount_in(amount_out, reserve_in, reserve_out)
+        if amount_in <= 0 or amount_in > swap.amount_in:
+            return reserve0, reserve1, False
+
+    reserve_in += amount_in
+    reserve_out -= amount_out
+    if swap.zero_for_one:
+        return reserve_in, reserve_out, True
+    return reserve_out, reserve_in, True
+
+
+class SwapEvaluation(NamedTuple):
+    expected_out: int            # victim output at the reserves it will execute against
+    slippage: float              # tolerance implied by its amountOutMin
+    max_frontrun: int            # largest front-run input that still lets it clear
+    profit: int                  # front-run + back-run result in input token units, can be negative
+
+
+def evaluate_swap(swap, reserve0, reserve1):
+    """
+    Score a pending exact-in swap as a sandwich candidate
+
+    Uses the closed-form front-run bound from amm_math and replays
+    front-run, victim and back-run on the given reserves.
+    """
+    if swap.zero_for_one:
+        reserve_in, reserve_out = reserve0, reserve1
+    else:
+        reserve_in, reserve_out = reserve1, reserve0
+
+    if not swap.exact_in:
+        expected_in = amm_math.get_amount_in(swap.amount_out, reserve_in, reserve_out)
+        slippage = 1.0 - expected_in / swap.amount_in if swap.amount_in else 0.0
+        return SwapEvaluation(swap.amount_out, slippage, 0, 0)
+
+    victim_in = swap.amount_in
+    expected_out = amm_math.get_amount_out(victim_in, reserve_in, reserve_out)
+    slippage = amm_math.implied_slippage(victim_in, swap.amount_out, reserve_in, reserve_out)
+    frontrun_in = amm_math.max_frontrun_input(victim_in, swap.amount_out, reserve_in, reserve_out)
+    if frontrun_in <= 0:
+        return SwapEvaluation(expected_out, slippage, 0, 0)
+
+    frontrun_out = amm_math.get_amount_out(frontrun_in, reserve_in, reserve_out)
+    reserve_in += frontrun_in
+    reserve_out -= frontrun_out
+    victim_out = amm_math.get_amount_out(victim_in, reserve_in, reserve_out)
+    reserve_in += victim_in
+    reserve_out -= victim_out
+    backrun_out = amm_math.get_amount_out(frontrun_out, reserve_out, reserve_in)
+    return SwapEvaluation(expected_out, slippage, frontrun_in, backrun_out - frontrun_in)
+
+
+class PendingStateOverlay:
+    def __init__(self, ttl = 36.0):
+        """
+        Pending router swaps layered over confirmed pair reserves
+
+        Swaps are kept per pair ordered by effective tip against the next
+        base fee (highest first, then arrival), the order a builder would
+        most likely include them. set_base_fee() re-sorts on every head,
+        until the first one the tip cap alone is used.
+        Projecting a pair folds its k pending swaps over the confirmed reserves
+        into a new tuple without touching the confirmed state, and the result
+        is cached until the pair's pending set or confirmed reserves change.
+
+        Only the first hop of a multi-hop path is tracked, its input amount is
+        the only one known before execution.
+
+        Args:
+            ttl: Seconds a pending swap is kept without being mined or replaced
+        """
+        self.ttl = ttl
+        self.base_fee = None
+
+        # pair -> sorted [(-effective tip, seq, tx_hash)]
+        self._queues = {}
+        self._swaps = {}
+        # (sender, nonce) -> tx_hash, a new tx with the same nonce replaces the old one
+        self._by_nonce = {}
+        # (expires_at, tx_hash) min-heap, stale entries are skipped
+        self._expiry = []
+        # pair -> (confirmed reserves, ProjectedState)
+        self._projections = {}
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._swaps)
+
+    def pending(self, pair):
+        """Pending swaps on a pair in execution order"""
+        return [self._swaps[tx_hash] for _, _, tx_hash in self._queues.get(pair, ())]
+
+    def add_swap_call(self, tx_hash, sender, nonce, gas_priority, tip_cap, value, swap_call, pair, now = None):
+        """Register a decoded router SwapCall, returns the PendingSwap"""
+        token_in, token_out = swap_call.path[0], swap_call.path[1]
+        multi_hop = len(swap_call.path) > 2
+        if multi_hop and not swap_call.exact_in:
+            # Exact-out over several hops: the first hop's output is unknown
+            return None
+
+        # Exact-in: the input, exact-out: the most the sender will pay
+        amount_in = value if swap_call.eth_in else swap_call.amount_in
+        # amountOutMin bounds the last hop, the first hop of a longer path has no own minimum
+        amount_out = 0 if multi_hop else swap_call.amount_out_min
+
+        now = time.monotonic() if now is None else now
+        swap = PendingSwap(
+            tx_hash = tx_hash,
+            sender = sender,
+            nonce = nonce,
+            gas_priority = gas_priority,
+            tip_cap = tip_cap,
+            pair = pair,
+            zero_for_one = token_in < token_out,
+            exact_in = swap_call.exact_in,
+            amount_in = amount_in or 0,
+            amount_out = amount_out,
+            expires_at = now + self.ttl,
+        )
+        self.add(swap, now)
+        return swap
+
+    def add(self, swap, now = None):
+        self.expire(time.monotonic() if now is None else now)
+
+        if swap.tx_hash in self._swaps:
+            return
+        if swap.nonce is not None:
+            replaced = self._by_nonce.get((swap.sender, swap.nonce))
+            if replaced is not None:
+                self.remove(replaced)
+            self._by_nonce[(swap.sender, swap.nonce)] = swap.tx_hash
+
+        self._swaps[swap.tx_hash] = swap
+        queue = self._queues.get(swap.pair)
+        if queue is None:
+            queue = self._queues[swap.pair] = []
+        insort(queue, (-effective_tip(swap, self.base_fee), self._seq, swap.tx_hash))
+        self._seq += 1
+        heapq.heappush(self._expiry, (swap.expires_at, swap.tx_hash))
+        self._projections.pop(swap.pair, None)
+
+    def remove(self, tx_hash):
+        """Drop a swap that was mined, replaced or dropped, returns True if it was pending"""
+        swap = self._swaps.pop(tx_hash, None)
+        if swap is None:
+            return False
+
+        queue = self._queues[swap.pair]
+        for index, entry in enumerate(queue):
+            if entry[2] == tx_hash:
+                del queue[index]
+                break
+        if not queue:
+            del self._queues[swap.pair]
+        if swap.nonce is not None and self._by_nonce.get((swap.sender, swap.nonce)) == tx_hash:
+            del self._by_nonce[(swap.sender, swap.nonce)]
+        self._projections.pop(swap.pair, None)
+        return True
+
+    def mined(self, tx_hash):
+        """Swap listener hook: a Swap log for tx_hash was confirmed"""
+        return self.remove(tx_hash)
+
+    def set_base_fee(self, base_fee):
+        """Re-order every pair for the base fee of the next block"""
+        if base_fee == self.base_fee:
+            return
+        self.base_fee = base_fee
+        swaps = self._swaps
+        for queue in self._queues.values():
+            queue[:] = sorted(
+                (-effective_tip(swaps[tx_hash], base_fee), seq, tx_hash) for _, seq, tx_hash in queue
+            )
+        self._projections.clear()
+
+    def expire(self, now = None):
+        now = time.monotonic() if now is None else now
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            _, tx_hash = heapq.heappop(expiry)
+            swap = self._swaps.get(tx_hash)
+            if swap is not None and swap.expires_at <= now:
+                self.remove(tx_hash)
+
+    def project_before(self, pair, reserves, tx_hash):
+        """Reserves a pending swap will execute against: the pair after every swap ordered ahead of it"""
+        if reserves is None:
+            return None
+        self.expire()
+        reserve0, reserve1 = reserves[0], reserves[1]
+        for _, _, queued in self._queues.get(pair, ()):
+            if queued == tx_hash:
+                break
+            reserve0, reserve1, _ = simulate_swap(self._swaps[queued], reserve0, reserve1)
+        return reserve0, reserve1
+
+    def project(self, pair, reserves):
+        """
+        Post-state of a pair after its pending swaps, O(k) in the pending count
+
+        Args:
+            pair: 20-byte pair address
+            reserves: Confirmed (reserve0, reserve1, ...) tuple, e.g. a Reserves record
+        """
+        if reserves is None:
+            return None
+        # Expired swaps leave before the cache is consulted, they drop its entry
+        self.expire()
+        cached = self._projections.get(pair)
+        if cached is not None and cached[0] == reserves:
+            return cached[1]
+
+        reserve0, reserve1 = reserves[0], reserves[1]
+        applied = reverted = 0
+        for _, _, tx_hash in self._queues.get(pair, ()):
+            reserve0, reserve1, executed = simulate_swap(self._swaps[tx_hash], reserve0, reserve1)
+            if executed:
+                applied += 1
+            else:
+                reverted += 1
+
+        projected = ProjectedState(reserve0, reserve1, applied, reverted)
+        self._projections[pair] = (reserves, projected)
+        return projected
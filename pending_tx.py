@@ -0,0 +1,255 @@
+import json
+import re
+import time
+from typing import NamedTuple, Optional
+
+import constant
+from swap_decoder import SwapDecoder
+
+
+def address_bytes(address):
+    """Normalize a hex address string to 20 bytes"""
+    if address is None:
+        return None
+    return bytes.fromhex(address[2:] if address.startswith('0x') else address)
+
+
+def _hex_int(value):
+    if value is None:
+        return None
+    return int(value, 16)
+
+
+def swap_volume(value, swap_call, weth):
+    """ETH going into a swap: msg.value for ETH-in methods, amountIn(Max) for WETH-in token swaps, else 0"""
+    if swap_call.eth_in:
+        return value
+    if swap_call.path[0] == weth:
+        return swap_call.amount_in
+    return 0
+
+
+class RawSwap(NamedTuple):
+    """Pre-checked frame routed by pair before any JSON parsing"""
+    frame: str
+    received_at: float
+    pair: bytes
+    hash: Optional[str] = None
+
+
+_MAX_FEE = re.compile(r'"maxFeePerGas"\s*:\s*"0x([0-9a-fA-F]+)"')
+_GAS_PRICE = re.compile(r'"gasPrice"\s*:\s*"0x([0-9a-fA-F]+)"')
+
+
+def raw_gas_priority(raw):
+    """PendingTx.gas_priority of a RawSwap read off the frame text, for DROP_LOWEST_GAS"""
+    match = _MAX_FEE.search(raw.frame) or _GAS_PRICE.search(raw.frame)
+    return int(match.group(1), 16) if match else 0
+
+
+class PendingTx:
+    """
+    Pending transaction from an alchemy_pendingTransactions frame
+
+    Built from the JSON-RPC result object, hex fields are decoded on first
+    access and cached, addresses are 20-byte values.
+    """
+    __slots__ = (
+        '_raw', 'received_at', 'parsed_at',
+        '_sender', '_to', '_value', '_gas_price', '_max_fee', '_max_priority_fee',
+        '_nonce', '_calldata', '_swap', '_decoder',
+    )
+
+    def __init__(self, raw, decoder, received_at = None):
+        self._raw = raw
+        self._decoder = decoder
+        # time.perf_counter() stamps
+        self.received_at = time.perf_counter() if received_at is None else received_at
+        self.parsed_at = None
+        self._sender = None
+        self._to = None
+        self._value = None
+        self._gas_price = None
+        self._max_fee = None
+        self._max_priority_fee = None
+        self._nonce = None
+        self._calldata = None
+        self._swap = False
+
+    @property
+    def hash(self):
+        return self._raw.get('hash')
+
+    @property
+    def block_number(self):
+        return self._raw.get('blockNumber')
+
+    @property
+    def sender(self):
+        if self._sender is None:
+            self._sender = address_bytes(self._raw.get('from'))
+        return self._sender
+
+    @property
+    def to(self):
+        if self._to is None:
+            self._to = address_bytes(self._raw.get('to'))
+        return self._to
+
+    @property
+    def value(self):
+        if self._value is None:
+            self._value = _hex_int(self._raw.get('value')) or 0
+        return self._value
+
+    @property
+    def gas_price(self):
+        if self._gas_price is None:
+            self._gas_price = _hex_int(self._raw.get('gasPrice')) or 0
+        return self._gas_price
+
+    @property
+    def max_fee(self):
+        if self._max_fee is None:
+            self._max_fee = _hex_int(self._raw.get('maxFeePerGas'))
+        return self._max_fee
+
+    @property
+    def max_priority_fee(self):
+        if self._max_priority_fee is None:
+            self._max_priority_fee = _hex_int(self._raw.get('maxPriorityFeePerGas'))
+        return self._max_priority_fee
+
+    @property
+    def gas_priority(self):
+        """Effective bid, maxFeePerGas for EIP-1559 transactions else gasPrice"""
+        max_fee = self.max_fee
+        return self.gas_price if max_fee is None else max_fee
+
+    @property
+    def tip_cap(self):
+        """Most the sender pays above the base fee, maxPriorityFeePerGas else gasPrice"""
+        max_priority_fee = self.max_priority_fee
+        return self.gas_price if max_priority_fee is None else max_priority_fee
+
+    @property
+    def nonce(self):
+        if self._nonce is None:
+            self._nonce = _hex_int(self._raw.get('nonce'))
+        return self._nonce
+
+    @property
+    def calldata(self):
+        if self._calldata is None:
+            data = self._raw.get('input') or '0x'
+            self._calldata = bytes.fromhex(data[2:] if data.startswith('0x') else data)
+        return self._calldata
+
+    @property
+    def swap(self):
+        """Decoded SwapCall, None if the input is not a router swap"""
+        if self._swap is False:
+            self._swap = self._decoder.decode(self.calldata)
+        return self._swap
+
+    def __repr__(self):
+        return f"PendingTx({self.hash})"
+
+
+class PendingTxParser:
+    def __init__(self, router_address = constant.ROUTER_ADDRESS, decoder = None, pair_resolver = None):
+        """
+        Fast ingestion of alchemy_pendingTransactions websocket frames
+
+        Frames are pre-checked on the raw text for the router address and a
+        known swap selector, anything else is rejected before json.loads.
+
+        Args:
+            router_address: Router the transaction must be sent to
+            decoder: SwapDecoder providing the accepted selectors
+            pair_resolver: PairResolver used by route()
+        """
+        self.decoder = decoder or SwapDecoder()
+        self.pair_resolver = pair_resolver
+        self.router = address_bytes(router_address)
+
+        # Nodes send lowercase hex, the checksum form is accepted as well
+        router_hex = self.router.hex()
+        self._router_str = (router_hex, router_address[2:])
+        self._router_bytes = tuple(value.encode() for value in self._router_str)
+
+        self._input_str = re.compile(r'"input"\s*:\s*"0x([0-9a-fA-F]{8})')
+        self._input_bytes = re.compile(rb'"input"\s*:\s*"0x([0-9a-fA-F]{8})')
+        self._selectors_str = frozenset(self.decoder.hex_selectors)
+        self._selectors_bytes = frozenset(selector.encode() for selector in self._selectors_str)
+
+        # Counters for the rejection rate
+        self.frames = 0
+        self.rejected = 0
+
+    def _swap_input(self, frame):
+        # Match of the input selector if the frame may hold a router swap
+        if isinstance(frame, str):
+            routers, pattern, selectors = self._router_str, self._input_str, self._selectors_str
+        else:
+            routers, pattern, selectors = self._router_bytes, self._input_bytes, self._selectors_bytes
+
+        if routers[0] not in frame and routers[1] not in frame:
+            return None
+        match = pattern.search(frame)
+        if match is None or match.group(1).lower() not in selectors:
+            return None
+        return match
+
+    def precheck(self, frame):
+        """True if a raw frame may hold a router swap, never builds a dict"""
+        return self._swap_input(frame) is not None
+
+    def route(self, frame, received_at = None):
+        """
+        Pre-check a frame and find the pair of its first hop on the raw text
+
+        Used when parsing happens on another process: the frame stays a
+        string and only the path head is read out of the input hex.
+
+        Returns:
+            RawSwap or None if the frame is not a pending router swap
+        """
+        self.frames += 1
+        if isinstance(frame, bytes):
+            frame = frame.decode('utf-8')
+        match = self._swap_input(frame)
+        hop = match and self.decoder.first_hop(frame, match.start(1))
+        if not hop or hop[0] == hop[1]:
+            self.rejected += 1
+            return None
+        return RawSwap(
+            frame,
+            time.perf_counter() if received_at is None else received_at,
+            self.pair_resolver.pair_for(hop[0], hop[1])
+        )
+
+    def parse(self, frame, received_at = None):
+        """
+        Turn a websocket frame into a PendingTx
+
+        Returns:
+            PendingTx or None if the frame is not a pending router swap
+        """
+        self.frames += 1
+        if not self.precheck(frame):
+            self.rejected += 1
+            return None
+
+        try:
+            result = json.loads(frame)['params']['result']
+        except (ValueError, KeyError, TypeError):
+            self.rejected += 1
+            return None
+
+        if not isinstance(result, dict) or address_bytes(result.get('to')) != self.router:
+            self.rejected += 1
+            return None
+        transaction = PendingTx(result, self.decoder, received_at)
+        transaction.parsed_at = time.perf_counter()
+        return transaction
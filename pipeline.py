@@ -0,0 +1,228 @@
+import asyncio
+import heapq
+import logging
+
+
+DROP_OLDEST = 'drop_oldest'
+DROP_LOWEST_GAS = 'drop_lowest_gas'
+DROP_POLICIES = (DROP_OLDEST, DROP_LOWEST_GAS)
+
+
+def gas_priority(transaction):
+    """Effective bid of a pending transaction, maxFeePerGas for EIP-1559 else gasPrice"""
+    if not isinstance(transaction, dict):
+        # PendingTx and other records carry it already decoded
+        return transaction.gas_priority
+    value = transaction.get('maxFeePerGas') or transaction.get('gasPrice') or 0
+    if isinstance(value, str):
+        return int(value, 16)
+    return value
+
+
+class StageStats:
+    __slots__ = ('name', 'enqueued', 'dropped', 'processed', 'errors', 'max_depth', 'depth')
+
+    def __init__(self, name):
+        self.name = name
+        self.enqueued = 0
+        self.dropped = 0
+        self.processed = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.depth = 0
+
+    def as_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class BoundedQueue:
+    def __init__(self, maxsize, policy = DROP_OLDEST, priority = gas_priority, name = 'queue'):
+        """
+        FIFO queue that never blocks the producer, a full queue sheds load instead
+
+        Args:
+            maxsize: Capacity, put() beyond it drops one item per the policy
+            policy: DROP_OLDEST evicts the head, DROP_LOWEST_GAS evicts the lowest
+                priority item (or rejects the new one if it is the lowest)
+            priority: item -> int, used by DROP_LOWEST_GAS
+            name: Stage name reported in stats
+        """
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.priority = priority
+        self.stats = StageStats(name)
+
+        # seq -> item, insertion ordered so the first key is the FIFO head
+        self._items = {}
+        self._seq = 0
+        # (priority, seq) min-heap for DROP_LOWEST_GAS, consumed entries are skipped lazily
+        self._heap = []
+        self._waiters = []
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        """
+        Enqueue without blocking
+
+        Returns:
+            bool: False if the item itself was dropped
+        """
+        stats = self.stats
+        stats.enqueued += 1
+
+        if len(self._items) >= self.maxsize:
+            stats.dropped += 1
+            if self.policy == DROP_OLDEST:
+                del self._items[next(iter(self._items))]
+            else:
+                rank = self.priority(item)
+                lowest = self._peek_lowest()
+                if lowest is None or rank <= lowest[0]:
+                    return False
+                heapq.heappop(self._heap)
+                del self._items[lowest[1]]
+
+        seq = self._seq
+        self._seq += 1
+        self._items[seq] = item
+        if self.policy == DROP_LOWEST_GAS:
+            heapq.heappush(self._heap, (self.priority(item), seq))
+            if len(self._heap) > 2 * self.maxsize:
+                # Drop entries already consumed by get()
+                self._heap = [entry for entry in self._heap if entry[1] in self._items]
+                heapq.heapify(self._heap)
+
+        depth = len(self._items)
+        stats.depth = depth
+        if depth > stats.max_depth:
+            stats.max_depth = depth
+
+        while self._waiters:
+            waiter = self._waiters.pop()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+        return True
+
+    async def get(self):
+        while not self._items:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                raise
+
+        seq = next(iter(self._items))
+        item = self._items.pop(seq)
+        self.stats.depth = len(self._items)
+        if self._heap and not self._items:
+            self._heap.clear()
+        return item
+
+    def drain(self):
+        """Take every queued item at once, in FIFO order, without waiting"""
+        items = list(self._items.values())
+        self._items.clear()
+        self._heap.clear()
+        self.stats.depth = 0
+        return items
+
+    def _peek_lowest(self):
+        heap = self._heap
+        while heap and heap[0][1] not in self._items:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+
+class TxPipeline:
+    def __init__(
+        self,
+        evaluate,
+        decide,
+        workers = 4,
+        parse_queue_size = 4096,
+        decision_queue_size = 256,
+        parse_policy = DROP_OLDEST,
+        decision_policy = DROP_OLDEST):
+        """
+        Staged mempool processing: reader -> parse queue -> N evaluate workers -> decision sink
+
+        Args:
+            evaluate: Coroutine function tx -> result or None, run by the workers
+            decide: Coroutine function result -> None, run by the single sink
+            workers: Number of concurrent evaluate workers
+            parse_queue_size: Capacity of the queue between the reader and the workers
+            decision_queue_size: Capacity of the queue between the workers and the sink
+            parse_policy: Drop policy of the parse queue
+            decision_policy: Drop policy of the decision queue
+        """
+        self.evaluate = evaluate
+        self.decide = decide
+        self.workers = workers
+
+        self.parse_queue = BoundedQueue(parse_queue_size, parse_policy, name = 'parse')
+        self.decision_queue = BoundedQueue(
+            decision_queue_size,
+            decision_policy,
+            priority = lambda result: result.get('gas_priority', 0),
+            name = 'decision'
+        )
+        self._tasks = []
+
+    def submit(self, transaction):
+        """Hand a pending transaction to the pipeline, never blocks the reader"""
+        return self.parse_queue.put(transaction)
+
+    def start(self):
+        if self._tasks:
+            return
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(loop.create_task(self._sink()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions = True)
+        self._tasks = []
+
+    def stats(self):
+        return {
+            'parse': self.parse_queue.stats.as_dict(),
+            'decision': self.decision_queue.stats.as_dict(),
+        }
+
+    async def _worker(self):
+        queue = self.parse_queue
+        stats = queue.stats
+        while True:
+            transaction = await queue.get()
+            try:
+                result = await self.evaluate(transaction)
+            except Exception as e:
+                stats.errors += 1
+                logging.error(f"Error evaluating transaction: {e}")
+                continue
+            stats.processed += 1
+            if result is not None:
+                self.decision_queue.put(result)
+
+    async def _sink(self):
+        queue = self.decision_queue
+        stats = queue.stats
+        while True:
+            result = await queue.get()
+            try:
+                await self.decide(result)
+            except Exception as e:
+                stats.errors += 1
+                logging.error(f"Error in decision sink: {e}")
+                continue
+            stats.processed += 1
@@ -0,0 +1,221 @@
+"""
+Record and replay alchemy_pendingTransactions websocket frames
+
+Recordings are gzip files, one frame per line prefixed with its receive
+time: "<unix seconds>\\t<frame>". Recording appends a new gzip member per
+session, so a file can be extended across runs and read as one stream.
+
+Usage:
+    python replay.py record <file> [seconds]
+    python replay.py serve <file> [speed] [port]    speed: 1, 2, ... or max
+"""
+import asyncio
+import gzip
+import itertools
+import json
+import logging
+import sys
+import time
+
+import websockets
+
+
+def _write(f, frames):
+    for timestamp, frame in frames:
+        if isinstance(frame, bytes):
+            frame = frame.decode('utf-8')
+        f.write(f"{timestamp:.6f}\t{frame.replace(chr(10), ' ')}\n")
+
+
+def write_frames(path, frames):
+    """Append (timestamp, frame) pairs to a recording as one gzip member"""
+    with gzip.open(path, 'at', encoding = 'utf-8') as f:
+        _write(f, frames)
+
+
+def read_frames(path):
+    """Yield (timestamp, frame) pairs from a recording"""
+    with gzip.open(path, 'rt', encoding = 'utf-8') as f:
+        for line in f:
+            timestamp, _, frame = line.rstrip('\n').partition('\t')
+            if frame:
+                yield float(timestamp), frame
+
+
+class FrameRecorder:
+    def __init__(self, path, flush_every = 256):
+        """
+        Append-only recorder for raw websocket frames
+
+        The file stays open for the whole session, so one recording session
+        is one gzip member. flush() pushes buffered frames through to disk
+        with a sync flush, close() ends the member.
+
+        Args:
+            path: gzip recording file, appended to if it exists
+            flush_every: Frames buffered in memory between writes
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self.recorded = 0
+        self._buffer = []
+        self._file = None
+
+    def record(self, frame, timestamp = None):
+        self._buffer.append((time.time() if timestamp is None else timestamp, frame))
+        self.recorded += 1
+        if len(self._buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            buffer, self._buffer = self._buffer, []
+            if self._file is None:
+                self._file = gzip.open(self.path, 'at', encoding = 'utf-8')
+            _write(self._file, buffer)
+            self._file.flush()
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+async def record(url, path, subscription, duration = None):
+    """
+    Subscribe to a websocket endpoint and record every frame
+
+    Args:
+        url: Websocket endpoint
+        path: Recording file
+        subscription: eth_subscribe request (dict)
+        duration: Seconds to record, None for until cancelled
+    """
+    recorder = FrameRecorder(path)
+    deadline = None if duration is None else time.monotonic() + duration
+    try:
+        async with websockets.connect(url, max_size = None) as websocket:
+            await websocket.send(json.dumps(subscription))
+            print(f"Subscription confirmed: {await websocket.recv()}")
+            while deadline is None or time.monotonic() < deadline:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    frame = await asyncio.wait_for(websocket.recv(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                recorder.record(frame)
+    finally:
+        recorder.close()
+        print(f"Recorded {recorder.recorded} frames to {path}")
+    return recorder.recorded
+
+
+class ReplayServer:
+    def __init__(self, frames, speed = 1.0, host = '127.0.0.1', port = 0):
+        """
+        Local stand-in websocket node replaying a recording
+
+        Answers eth_subscribe with a subscription id, then sends the recorded
+        frames with their original spacing divided by `speed`, or back to back
+        when speed is None. Other requests get a null result.
+
+        Args:
+            frames: List of (timestamp, frame) pairs
+            speed: Replay speed multiplier, None for max speed
+            host: Listen address
+            port: Listen port, 0 picks a free one
+        """
+        self.frames = frames
+        self.speed = speed
+        self.host = host
+        self.port = port
+        self.sent = 0
+        self.finished = asyncio.Event()
+        self._server = None
+        self._ids = itertools.count(1)
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await websockets.serve(self._handle, self.host, self.port, max_size = None)
+        self.port = next(iter(self._server.sockets)).getsockname()[1]
+        return self
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, websocket, *args):
+        try:
+            await self._serve(websocket)
+        except websockets.ConnectionClosed:
+            # The consumer went away, mid-replay or between requests
+            pass
+
+    async def _serve(self, websocket):
+        async for message in websocket:
+            request = json.loads(message)
+            if request.get('method') != 'eth_subscribe':
+                await websocket.send(json.dumps({'jsonrpc': '2.0', 'id': request.get('id'), 'result': None}))
+                continue
+            subscription = hex(next(self._ids))
+            await websocket.send(json.dumps({'jsonrpc': '2.0', 'id': request.get('id'), 'result': subscription}))
+            await self._replay(websocket)
+
+    async def _replay(self, websocket):
+        if not self.frames:
+            self.finished.set()
+            return
+        first = self.frames[0][0]
+        started = time.monotonic()
+        for timestamp, frame in self.frames:
+            if self.speed:
+                delay = (timestamp - first) / self.speed - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await websocket.send(frame)
+            self.sent += 1
+            if self.speed is None and self.sent % 256 == 0:
+                # Let the consumer run between bursts at max speed
+                await asyncio.sleep(0)
+        self.finished.set()
+
+
+def _parse_speed(value):
+    return None if value in ('max', '0') else float(value)
+
+
+async def _main(argv):
+    command, path = argv[0], argv[1]
+    if command == 'record':
+        import constant
+        subscription = {
+            "jsonrpc": "2.0",
+            "method": "eth_subscribe",
+            "params": [
+                "alchemy_pendingTransactions",
+                {"toAddress": [constant.ROUTER_ADDRESS], "hashesOnly": False}
+            ],
+            "id": 1
+        }
+        duration = float(argv[2]) if len(argv) > 2 else None
+        await record(constant.WEBSOCKET_URL, path, subscription, duration)
+    elif command == 'serve':
+        speed = _parse_speed(argv[2]) if len(argv) > 2 else 1.0
+        port = int(argv[3]) if len(argv) > 3 else 8546
+        server = await ReplayServer(list(read_frames(path)), speed, port = port).start()
+        print(f"Replaying {len(server.frames)} frames on {server.url}")
+        await asyncio.Event().wait()
+    else:
+        raise SystemExit(__doc__)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level = logging.INFO)
+    if len(sys.argv) < 3:
+        raise SystemExit(__doc__)
+    asyncio.run(_main(sys.argv[1:]))
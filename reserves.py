@@ -0,0 +1,194 @@
+import logging
+from collections import OrderedDict
+from typing import NamedTuple
+
+import abi_tables
+
+
+SYNC_TOPIC = abi_tables.topic('Sync(uint112,uint112)')
+SWAP_TOPIC = abi_tables.topic('Swap(address,uint256,uint256,uint256,uint256,address)')
+
+
+class Reserves(NamedTuple):
+    reserve0: int
+    reserve1: int
+    block_number: int
+
+
+class SwapEvent(NamedTuple):
+    pair: bytes                  # 20-byte pair address
+    sender: bytes
+    to: bytes
+    amount0_in: int
+    amount1_in: int
+    amount0_out: int
+    amount1_out: int
+    block_number: int
+    transaction_hash: str
+
+
+def _hex_to_int(value):
+    if isinstance(value, int):
+        return value
+    return int(value, 16)
+
+
+def _topic_address(topic):
+    # Indexed address topics are 32-byte words, the address is the last 20 bytes
+    return bytes.fromhex(topic[-40:])
+
+
+def decode_sync_data(data):
+    """Decode the non-indexed data of a Sync log into (reserve0, reserve1)"""
+    if data.startswith('0x'):
+        data = data[2:]
+    return int(data[0:64], 16), int(data[64:128], 16)
+
+
+def decode_swap_log(log):
+    """Decode a raw Swap log (eth_subscribe / eth_getLogs shape) into a SwapEvent"""
+    data = log['data']
+    if data.startswith('0x'):
+        data = data[2:]
+    topics = log['topics']
+    return SwapEvent(
+        pair = bytes.fromhex(log['address'][2:]),
+        sender = _topic_address(topics[1]),
+        to = _topic_address(topics[2]),
+        amount0_in = int(data[0:64], 16),
+        amount1_in = int(data[64:128], 16),
+        amount0_out = int(data[128:192], 16),
+        amount1_out = int(data[192:256], 16),
+        block_number = _hex_to_int(log.get('blockNumber') or 0),
+        transaction_hash = log.get('transactionHash'),
+    )
+
+
+class ReserveStore:
+    def __init__(self, max_reorg_depth = 64):
+        """
+        In-memory mirror of Uniswap V2 pair reserves
+
+        Reserves are replaced from Sync logs (V2 emits Sync with the absolute
+        reserves on every mint/burn/swap), Swap logs are decoded and handed to
+        listeners. Each block keeps an undo journal of the reserves it replaced
+        so logs delivered with removed=true roll the mirror back.
+
+        Args:
+            max_reorg_depth: Number of recent blocks whose undo journal is kept
+        """
+        self.reserves = {}
+        self.max_reorg_depth = max_reorg_depth
+        self.swap_listeners = []
+        self.update_listeners = []
+
+        # block_number -> [(pair, previous Reserves or None), ...] in apply order
+        self._journal = OrderedDict()
+        self._head = 0
+
+        # topic0 -> handler, the only dispatch done per log
+        self._handlers = {
+            SYNC_TOPIC: self._apply_sync,
+            SWAP_TOPIC: self._apply_swap,
+        }
+
+    @property
+    def topics(self):
+        """Topic filter for a logs subscription covering every handled event"""
+        return [list(self._handlers)]
+
+    def get(self, pair):
+        """Latest Reserves for a 20-byte pair address, None if never seen"""
+        return self.reserves.get(pair)
+
+    def set(self, pair, reserve0, reserve1, block_number):
+        """Seed a pair from an on-chain read (getReserves) without journaling"""
+        current = self.reserves.get(pair)
+        if current is None or current.block_number <= block_number:
+            self.reserves[pair] = reserves = Reserves(reserve0, reserve1, block_number)
+            self._notify(pair, reserves)
+
+    def add_swap_listener(self, callback):
+        self.swap_listeners.append(callback)
+
+    def add_update_listener(self, callback):
+        """callback(pair, Reserves or None) on every change, including rollbacks"""
+        self.update_listeners.append(callback)
+
+    def _notify(self, pair, reserves):
+        for callback in self.update_listeners:
+            callback(pair, reserves)
+
+    def apply_log(self, log):
+        """
+        Apply one raw log from the logs subscription
+
+        Returns:
+            bool: True if the log was handled
+        """
+        topics = log.get('topics')
+        if not topics:
+            return False
+        handler = self._handlers.get(topics[0])
+        if handler is None:
+            return False
+
+        block_number = _hex_to_int(log.get('blockNumber') or 0)
+
+        if log.get('removed'):
+            self.rollback(block_number)
+            return True
+
+        try:
+            handler(log, block_number)
+        except (ValueError, IndexError, KeyError) as e:
+            logging.error(f"Error applying log {log.get('transactionHash')}: {e}")
+            return False
+        return True
+
+    def rollback(self, block_number):
+        """Undo every journaled change from block_number onwards"""
+        while self._journal:
+            last_block = next(reversed(self._journal))
+            if last_block < block_number:
+                break
+            changes = self._journal.pop(last_block)
+            for pair, previous in reversed(changes):
+                if previous is None:
+                    self.reserves.pop(pair, None)
+                else:
+                    self.reserves[pair] = previous
+                if self.update_listeners:
+                    self._notify(pair, previous)
+        self._head = min(self._head, block_number - 1)
+
+    def _apply_sync(self, log, block_number):
+        pair = bytes.fromhex(log['address'][2:])
+        reserve0, reserve1 = decode_sync_data(log['data'])
+
+        changes = self._journal.get(block_number)
+        if changes is None:
+            changes = self._journal[block_number] = []
+            self._prune(block_number)
+        changes.append((pair, self.reserves.get(pair)))
+
+        self.reserves[pair] = reserves = Reserves(reserve0, reserve1, block_number)
+        if self.update_listeners:
+            self._notify(pair, reserves)
+
+    def _apply_swap(self, log, block_number):
+        if not self.swap_listeners:
+            return
+        event = decode_swap_log(log)
+        for callback in self.swap_listeners:
+            callback(event)
+
+    def _prune(self, block_number):
+        if block_number > self._head:
+            self._head = block_number
+        horizon = self._head - self.max_reorg_depth
+        while self._journal:
+            first_block = next(iter(self._journal))
+            if first_block > horizon:
+                break
+            del self._journal[first_block]
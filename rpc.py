@@ -0,0 +1,203 @@
+import asyncio
+import itertools
+import json
+import logging
+
+import websockets
+
+
+class RpcError(Exception):
+    """JSON-RPC error response"""
+
+    def __init__(self, error):
+        self.code = error.get('code')
+        self.data = error.get('data')
+        super().__init__(error.get('message', str(error)))
+
+
+def _result(response):
+    if 'error' in response:
+        raise RpcError(response['error'])
+    return response.get('result')
+
+
+class _WebSocketConnection:
+    def __init__(self, url):
+        self.url = url
+        self.websocket = None
+        self.pending = {}
+        self._reader = None
+        self._connecting = None
+
+    @property
+    def in_flight(self):
+        return len(self.pending)
+
+    async def ensure_connected(self):
+        if self.websocket is not None:
+            return
+        if self._connecting is None:
+            self._connecting = asyncio.ensure_future(self._connect())
+        try:
+            await asyncio.shield(self._connecting)
+        finally:
+            if self._connecting is not None and self._connecting.done():
+                self._connecting = None
+
+    async def _connect(self):
+        self.websocket = await websockets.connect(self.url, max_size = None)
+        self._reader = asyncio.ensure_future(self._read(self.websocket))
+
+    async def _read(self, websocket):
+        try:
+            async for message in websocket:
+                response = json.loads(message)
+                for item in response if isinstance(response, list) else (response,):
+                    future = self.pending.pop(item.get('id'), None)
+                    if future is not None and not future.done():
+                        future.set_result(item)
+        except Exception as e:
+            logging.error(f"RPC connection to {self.url} lost: {e}")
+        finally:
+            if self.websocket is websocket:
+                self.websocket = None
+            error = ConnectionError(f"RPC connection to {self.url} closed")
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self.pending.clear()
+
+    async def send(self, request_id, payload):
+        await self.ensure_connected()
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        try:
+            await self.websocket.send(payload)
+        except Exception:
+            self.pending.pop(request_id, None)
+            raise
+        return future
+
+    def forget(self, request_id):
+        self.pending.pop(request_id, None)
+
+    async def close(self):
+        if self.websocket is not None:
+            await self.websocket.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions = True)
+
+
+class WebSocketRpcPool:
+    def __init__(self, url, size = 4, timeout = 5.0):
+        """
+        Pipelined JSON-RPC over a pool of persistent websocket connections
+
+        Requests are written without waiting for earlier responses and matched
+        back by id, each one goes to the connection with the fewest in flight.
+        Connections are opened on first use and reopened after a drop.
+
+        Args:
+            url: ws:// or wss:// endpoint
+            size: Number of connections
+            timeout: Default per-call timeout in seconds
+        """
+        self.url = url
+        self.timeout = timeout
+        self.connections = [_WebSocketConnection(url) for _ in range(size)]
+        self._ids = itertools.count(1)
+
+    async def request(self, method, params = (), timeout = None):
+        request_id = next(self._ids)
+        payload = json.dumps({'jsonrpc': '2.0', 'id': request_id, 'method': method, 'params': list(params)})
+        connection = min(self.connections, key = lambda c: c.in_flight)
+        # One deadline for (re)connecting, sending and the response
+        timeout = timeout or self.timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            future = await asyncio.wait_for(connection.send(request_id, payload), timeout)
+            response = await asyncio.wait_for(future, max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            connection.forget(request_id)
+            raise
+        return _result(response)
+
+    async def close(self):
+        await asyncio.gather(*(connection.close() for connection in self.connections))
+
+
+class HttpRpcPool:
+    def __init__(self, url, size = 16, timeout = 5.0):
+        """
+        JSON-RPC over a shared aiohttp session with a bounded keep-alive connection pool
+
+        Args:
+            url: http:// or https:// endpoint
+            size: Maximum number of pooled connections
+            timeout: Default per-call timeout in seconds
+        """
+        self.url = url
+        self.size = size
+        self.timeout = timeout
+        self._session = None
+        self._ids = itertools.count(1)
+
+    def _get_session(self):
+        if self._session is None:
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector = aiohttp.TCPConnector(limit = self.size, keepalive_timeout = 60),
+                json_serialize = json.dumps
+            )
+        return self._session
+
+    async def request(self, method, params = (), timeout = None):
+        import aiohttp
+        payload = {'jsonrpc': '2.0', 'id': next(self._ids), 'method': method, 'params': list(params)}
+        client_timeout = aiohttp.ClientTimeout(total = timeout or self.timeout)
+        async with self._get_session().post(self.url, json = payload, timeout = client_timeout) as response:
+            return _result(await response.json(content_type = None))
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class RpcClient:
+    def __init__(self, url, pool_size = 4, timeout = 5.0):
+        """
+        Async JSON-RPC client for the hot path, never blocks the event loop
+
+        Args:
+            url: RPC endpoint, websocket URLs get a pipelined connection pool,
+                http URLs a keep-alive session pool
+            pool_size: Number of pooled connections
+            timeout: Default per-call timeout in seconds
+        """
+        if url.startswith(('ws://', 'wss://')):
+            self.transport = WebSocketRpcPool(url, pool_size, timeout)
+        else:
+            self.transport = HttpRpcPool(url, pool_size, timeout)
+        self.url = url
+
+    async def request(self, method, params = (), timeout = None):
+        return await self.transport.request(method, params, timeout)
+
+    async def chain_id(self, timeout = None):
+        return int(await self.request('eth_chainId', timeout = timeout), 16)
+
+    async def block_number(self, timeout = None):
+        return int(await self.request('eth_blockNumber', timeout = timeout), 16)
+
+    async def eth_call(self, target, data, block = 'latest', timeout = None):
+        """eth_call with raw 20-byte target and calldata, returns the raw return bytes"""
+        if isinstance(target, (bytes, bytearray)):
+            target = '0x' + target.hex()
+        call = {'to': target, 'data': '0x' + bytes(data).hex()}
+        result = await self.request('eth_call', (call, block), timeout)
+        return bytes.fromhex(result[2:])
+
+    async def close(self):
+        await self.transport.close()
@@ -0,0 +1,617 @@
+import asyncio
+import logging
+import multiprocessing
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+from typing import NamedTuple, Optional
+
+from pending_state import PendingStateOverlay, ProjectedState, SwapEvaluation, evaluate_swap
+from pending_tx import PendingTxParser, raw_gas_priority, swap_volume
+from pipeline import DROP_OLDEST, BoundedQueue
+from swap_decoder import SwapCall
+
+
+# seq, pair, reserve0 lo/hi, reserve1 lo/hi, block_number
+RECORD = struct.Struct('<Q20s4xQQQQQ')
+SEQ = struct.Struct('<Q')
+EMPTY_PAIR = bytes(20)
+_LOW = (1 << 64) - 1
+
+# Messages a worker handles before its results go back by default, bounds reply bursts
+REPLY_EVERY = 128
+# Seconds between checks for room while reading replies is paused
+RESUME_INTERVAL = 0.001
+
+# Highest share of occupied slots, linear probes stay short below it
+MAX_LOAD = 0.7
+# Seconds between "load limit" errors while pairs are being dropped
+DROP_LOG_INTERVAL = 60.0
+
+
+class FrameConfig(NamedTuple):
+    """What a shard needs to parse and filter raw pending tx frames on its own"""
+    router_address: str
+    weth: bytes
+    filter_volume: int
+
+
+class ShardedSwap(NamedTuple):
+    """A pending swap that passed the volume filter on a shard, evaluated there"""
+    tx_hash: str
+    block_number: Optional[str]
+    sender: bytes
+    to: bytes
+    gas_price: int
+    gas_priority: int
+    value: int
+    volume: int
+    swap_call: SwapCall
+    pair: bytes
+    received_at: float
+    reserves: Optional[tuple]          # (reserve0, reserve1, block_number), None if the pair has none
+    projected: Optional[ProjectedState]
+    evaluation: Optional[SwapEvaluation]
+
+
+def _slot_hash(pair):
+    # Pair addresses are CREATE2 outputs, their bytes are already uniform
+    return int.from_bytes(pair[:8], 'little')
+
+
+class SharedReserveTable:
+    def __init__(self, capacity = 1 << 16, name = None):
+        """
+        Fixed-width pair reserve records in a shared memory block
+
+        An open-addressing hash table keyed by pair address, one 72-byte
+        record per slot. The owning process is the only writer, other
+        processes attach by name and read records in place, nothing is
+        pickled per lookup. Each record carries a sequence counter that is
+        odd while a write is in progress, readers retry until they see the
+        same even value before and after copying the record.
+
+        At most MAX_LOAD of the slots are filled, new pairs past that are
+        dropped (see ShardedEvaluator.update for growing the table instead),
+        so a probe always ends on an empty slot after a few steps.
+
+        Args:
+            capacity: Number of slots, rounded up to a power of two
+            name: Attach to an existing table instead of creating one
+        """
+        self.capacity = 1 << max(0, capacity - 1).bit_length()
+        self._mask = self.capacity - 1
+        self.limit = int(self.capacity * MAX_LOAD)
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create = True, size = self.capacity * RECORD.size)
+        else:
+            self.shm = shared_memory.SharedMemory(name = name)
+        self.name = self.shm.name
+        self._buf = self.shm.buf
+
+        # Writer-side index, readers probe
+        self._slots = {}
+        self.dropped = 0
+        self._logged_at = None
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, pair):
+        return pair in self._slots
+
+    @property
+    def full(self):
+        """True once another pair would go past the load limit"""
+        return len(self._slots) >= self.limit
+
+    def _find(self, pair):
+        buf = self._buf
+        index = _slot_hash(pair) & self._mask
+        for _ in range(self.capacity):
+            slot_pair = buf[index * RECORD.size + 8:index * RECORD.size + 28]
+            if slot_pair == pair or slot_pair == EMPTY_PAIR:
+                return index
+            index = (index + 1) & self._mask
+        return None
+
+    def put(self, pair, reserve0, reserve1, block_number):
+        """Write a pair's reserves, owner process only"""
+        index = self._slots.get(pair)
+        if index is None:
+            if self.full:
+                self._drop()
+                return False
+            index = self._slots[pair] = self._find(pair)
+
+        offset = index * RECORD.size
+        buf = self._buf
+        seq = SEQ.unpack_from(buf, offset)[0]
+        SEQ.pack_into(buf, offset, seq + 1)
+        RECORD.pack_into(
+            buf, offset, seq + 1, pair,
+            reserve0 & _LOW, reserve0 >> 64,
+            reserve1 & _LOW, reserve1 >> 64,
+            block_number
+        )
+        SEQ.pack_into(buf, offset, seq + 2)
+        return True
+
+    def _drop(self):
+        self.dropped += 1
+        now = time.monotonic()
+        if self._logged_at is None or now - self._logged_at >= DROP_LOG_INTERVAL:
+            self._logged_at = now
+            logging.error(
+                f"Shared reserve table at its load limit ({len(self._slots)} of {self.capacity} slots), "
+                f"{self.dropped} pairs dropped"
+            )
+
+    def resized(self, capacity):
+        """New owned table of the given capacity holding every record of this one"""
+        table = SharedReserveTable(capacity)
+        buf = self._buf
+        for pair, index in self._slots.items():
+            record = RECORD.unpack_from(buf, index * RECORD.size)
+            table.put(pair, record[2] | (record[3] << 64), record[4] | (record[5] << 64), record[6])
+        return table
+
+    def update(self, pair, reserves):
+        """ReserveStore update listener, None (rolled back past the first Sync) clears the record"""
+        if reserves is None:
+            if pair in self._slots:
+                self.put(pair, 0, 0, 0)
+            return
+        self.put(pair, reserves[0], reserves[1], reserves[2])
+
+    def get(self, pair):
+        """(reserve0, reserve1, block_number) or None if the pair has no reserves"""
+        buf = self._buf
+        index = _slot_hash(pair) & self._mask
+        for _ in range(self.capacity):
+            offset = index * RECORD.size
+            while True:
+                record = RECORD.unpack_from(buf, offset)
+                if not record[0] & 1 and SEQ.unpack_from(buf, offset)[0] == record[0]:
+                    break
+            slot_pair = record[1]
+            if slot_pair == pair:
+                if not record[6] and not (record[2] or record[3]):
+                    return None
+                return (
+                    record[2] | (record[3] << 64),
+                    record[4] | (record[5] << 64),
+                    record[6],
+                )
+            if slot_pair == EMPTY_PAIR:
+                return None
+            index = (index + 1) & self._mask
+        return None
+
+    def close(self):
+        self._buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _shard_main(table_name, capacity, tasks, results, ttl, frame_config, reply_every):
+    """
+    Worker process: owns the pending overlays of its pairs
+
+    Every recv is a batch of ('frame', frame, received_at, pair), ('mined',
+    tx_hash), ('base_fee', next_base_fee) and ('table', name, capacity)
+    messages, the last one moves the worker to a grown reserve table. None
+    asks the worker to exit. Results go back as (swaps, counts, tips) after
+    every reply_every messages and whenever nothing else is queued, so one
+    reply never carries more than reply_every swaps. The parent feeds the
+    task pipe from a thread and reads replies from its event loop, a send
+    blocked on a full pipe here never waits on a blocked parent.
+    """
+    table = SharedReserveTable(capacity, name = table_name)
+    overlay = PendingStateOverlay(ttl)
+    frames = _FrameShard(table, overlay, frame_config)
+    handled = 0
+    try:
+        while True:
+            batch = tasks.recv()
+            if batch is None:
+                break
+            for message in batch:
+                kind = message[0]
+                if kind == 'frame':
+                    frames.handle(message[1], message[2], message[3])
+                elif kind == 'mined':
+                    overlay.mined(message[1])
+                elif kind == 'base_fee':
+                    overlay.set_base_fee(message[1])
+                elif kind == 'table':
+                    table.close()
+                    table = frames.table = SharedReserveTable(message[2], name = message[1])
+                handled += 1
+                if handled == reply_every:
+                    _reply(results, frames)
+                    handled = 0
+            if handled and not tasks.poll():
+                _reply(results, frames)
+                handled = 0
+        _reply(results, frames)
+    except (EOFError, BrokenPipeError, KeyboardInterrupt):
+        pass
+    finally:
+        table.close()
+
+
+def _send_exit(connection):
+    try:
+        connection.send(None)
+    except OSError:
+        pass
+
+
+def _reply(results, frames):
+    collected = frames.collect()
+    if collected is not None:
+        results.send(collected)
+
+
+class _FrameShard:
+    def __init__(self, table, overlay, config):
+        """Parse, decode, filter and evaluate raw frames inside a worker"""
+        self.table = table
+        self.overlay = overlay
+        self.weth = config.weth
+        self.filter_volume = config.filter_volume
+        self.parser = PendingTxParser(config.router_address)
+
+        # Collected until the next reply
+        self.swaps = []
+        self.tips = []
+        # frames, swaps, filtered, errors, CPU seconds
+        self.counts = [0, 0, 0, 0, 0.0]
+
+    def collect(self):
+        """(swaps, counts, tips) since the last call, None if no frame came in"""
+        if not self.counts[0]:
+            return None
+        collected = (self.swaps, self.counts, self.tips)
+        self.swaps, self.tips, self.counts = [], [], [0, 0, 0, 0, 0.0]
+        return collected
+
+    def handle(self, frame, received_at, pair):
+        started = time.process_time()
+        try:
+            self._handle(frame, received_at, pair)
+        finally:
+            self.counts[4] += time.process_time() - started
+
+    def _handle(self, frame, received_at, pair):
+        counts = self.counts
+        counts[0] += 1
+        try:
+            transaction = self.parser.parse(frame, received_at)
+            if transaction is None:
+                return
+            tip = transaction.max_priority_fee
+            if tip is not None:
+                self.tips.append(tip)
+            swap_call = transaction.swap
+            if swap_call is None:
+                return
+            counts[1] += 1
+
+            # Every swap moves the pair, so the overlay sees it before the volume filter
+            tx_hash = transaction.hash
+            value = transaction.value
+            overlay = self.overlay
+            swap = overlay.add_swap_call(
+                tx_hash, transaction.sender, transaction.nonce, transaction.gas_priority, transaction.tip_cap,
+                value, swap_call, pair
+            )
+            volume = swap_volume(value, swap_call, self.weth)
+            if volume < self.filter_volume:
+                counts[2] += 1
+                return
+
+            reserves = self.table.get(pair)
+            projected = evaluation = None
+            if reserves is not None:
+                projected = overlay.project(pair, reserves)
+                if swap is not None:
+                    evaluation = evaluate_swap(swap, *overlay.project_before(pair, reserves, tx_hash))
+            self.swaps.append(ShardedSwap(
+                tx_hash, transaction.block_number, transaction.sender, transaction.to,
+                transaction.gas_price, transaction.gas_priority, value, volume,
+                swap_call, pair, received_at, reserves, projected, evaluation
+            ))
+        except Exception as e:
+            counts[3] += 1
+            logging.error(f"Error evaluating frame in shard: {e}")
+
+
+class ShardedEvaluator:
+    def __init__(
+        self,
+        shards,
+        frame_config,
+        capacity = 1 << 16,
+        ttl = 36.0,
+        on_swap = None,
+        on_tips = None,
+        room = None,
+        outbox_size = 4096,
+        policy = DROP_OLDEST,
+        reply_every = REPLY_EVERY):
+        """
+        Pending swap parsing and evaluation spread over worker processes
+
+        Frames are routed by pair address, so each worker keeps the pending
+        overlay of its own pairs and no state is shared between workers.
+        Confirmed reserves live in a SharedReserveTable written by this
+        process (hook update() into the ReserveStore) and read in place by
+        the workers. The table doubles when it reaches its load limit, the
+        workers are told to reattach to the new block by name. Outgrown
+        blocks stay until close(), a worker may still be attaching to one,
+        together they are smaller than the current block.
+
+        The event loop never touches a pipe synchronously. submit_frame()
+        puts a pre-checked RawSwap into the shard's BoundedQueue, which sheds
+        load by the pipeline's drop policies once the worker falls behind.
+        One thread per shard sends whatever is queued as a single batch, one
+        batch in flight at a time. Control messages (mined swaps, base fee,
+        table moves) are never dropped and go out ahead of the queued frames.
+        JSON parsing, decoding, the volume filter, the overlay and the AMM
+        math run on the worker, the swaps that pass the filter come back
+        through on_swap. Replies are read with add_reader, and reading
+        pauses while room() reports less space than one reply can fill
+        (reply_every swaps).
+
+        Args:
+            shards: Number of worker processes
+            frame_config: FrameConfig the workers parse and filter with
+            capacity: Initial slots in the shared reserve table
+            ttl: Seconds a pending swap is kept by the workers' overlays
+            on_swap: Called with each ShardedSwap coming back from the workers
+            on_tips: Called with lists of priority fees seen on router swaps
+            room: Returns how many more swaps on_swap can take without
+                dropping, e.g. the free slots of the decision queue
+            outbox_size: Frames queued per shard before the policy drops one
+            policy: DROP_OLDEST or DROP_LOWEST_GAS for the outboxes
+            reply_every: Messages a worker handles per reply, at most what room() can report
+        """
+        self.shards = shards
+        self.ttl = ttl
+        self.table = SharedReserveTable(capacity)
+        self._retired = []
+        self.frame_config = frame_config
+        self.on_swap = on_swap
+        self.on_tips = on_tips
+        self.room = room
+        self.reply_every = reply_every
+
+        self.outboxes = [
+            BoundedQueue(outbox_size, policy, priority = raw_gas_priority, name = f"shard-{index}")
+            for index in range(shards)
+        ]
+        self._control = [[] for _ in range(shards)]
+        self._senders = []
+        self._sending = [False] * shards
+        self._flush_scheduled = False
+        self._paused = False
+        self._processes = []
+        self._tasks = []
+        self._results = []
+        self._loop = None
+        self.base_fee = None
+
+        # Counters
+        self.submitted = [0] * shards
+        self.completed = 0
+        # Frames handled on the workers: frames, swaps, filtered, errors, CPU seconds
+        self.frame_counts = [0, 0, 0, 0, 0.0]
+
+    def update(self, pair, reserves):
+        """ReserveStore update listener, grows the table before a new pair would pass its load limit"""
+        table = self.table
+        if reserves is not None and table.full and pair not in table:
+            self._grow()
+        self.table.update(pair, reserves)
+
+    def _grow(self):
+        old = self.table
+        self.table = old.resized(old.capacity * 2)
+        self._retired.append(old)
+        if self._processes:
+            for shard in range(self.shards):
+                self._control_message(shard, ('table', self.table.name, self.table.capacity))
+        logging.info(f"Shared reserve table grown to {self.table.capacity} slots for {len(old)} pairs")
+
+    def shard_for(self, pair):
+        return int.from_bytes(pair[-4:], 'little') % self.shards
+
+    def start(self):
+        """Spawn the workers, must run inside the event loop"""
+        if self._processes:
+            return
+        self._loop = asyncio.get_running_loop()
+        # spawn: the parent runs an event loop and logging threads, fork would copy their locks
+        context = multiprocessing.get_context('spawn')
+        for index in range(self.shards):
+            task_reader, task_writer = context.Pipe(duplex = False)
+            result_reader, result_writer = context.Pipe(duplex = False)
+            process = context.Process(
+                target = _shard_main,
+                args = (
+                    self.table.name, self.table.capacity, task_reader, result_writer,
+                    self.ttl, self.frame_config, self.reply_every
+                ),
+                name = f"shard-{index}",
+                daemon = True
+            )
+            process.start()
+            task_reader.close()
+            result_writer.close()
+            self._processes.append(process)
+            self._tasks.append(task_writer)
+            self._results.append(result_reader)
+            self._senders.append(ThreadPoolExecutor(1, thread_name_prefix = f"shard-{index}-send"))
+            self._loop.add_reader(result_reader.fileno(), self._drain, result_reader)
+        if self.base_fee is not None:
+            self.set_base_fee(self.base_fee)
+        self._schedule_flush()
+        logging.info(f"Sharded evaluation: {self.shards} worker processes")
+
+    def submit_frame(self, raw):
+        """
+        Queue a RawSwap on its pair's shard, results arrive through on_swap
+
+        Returns:
+            bool: False if the outbox policy dropped the frame itself
+        """
+        shard = self.shard_for(raw.pair)
+        self.submitted[shard] += 1
+        accepted = self.outboxes[shard].put(raw)
+        self._schedule_flush()
+        return accepted
+
+    def set_base_fee(self, base_fee):
+        """FeeEstimator head listener: every worker re-orders its overlay for the next block"""
+        self.base_fee = base_fee
+        if self._processes:
+            for shard in range(self.shards):
+                self._control_message(shard, ('base_fee', base_fee))
+
+    def mined(self, tx_hash, pair):
+        """Swap listener hook: drop a mined swap from its pair's shard"""
+        if self._processes:
+            self._control_message(self.shard_for(pair), ('mined', tx_hash))
+
+    def _control_message(self, shard, message):
+        self._control[shard].append(message)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if not self._flush_scheduled and self._loop is not None:
+            self._flush_scheduled = True
+            self._loop.call_soon(self._flush)
+
+    def _flush(self):
+        self._flush_scheduled = False
+        if not self._processes:
+            return
+        for shard, outbox in enumerate(self.outboxes):
+            if self._sending[shard] or not (self._control[shard] or len(outbox)):
+                continue
+            batch, self._control[shard] = self._control[shard], []
+            frames = outbox.drain()
+            outbox.stats.processed += len(frames)
+            batch.extend(('frame', raw.frame, raw.received_at, raw.pair) for raw in frames)
+            self._sending[shard] = True
+            future = self._loop.run_in_executor(self._senders[shard], self._tasks[shard].send, batch)
+            future.add_done_callback(partial(self._sent, shard))
+
+    def _sent(self, shard, future):
+        self._sending[shard] = False
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.outboxes[shard].stats.errors += 1
+            logging.error(f"Sending to shard {shard} failed: {error}")
+        self._schedule_flush()
+
+    def _drain(self, connection):
+        room = self.room
+        try:
+            while connection.poll():
+                if room is not None and room() < self.reply_every:
+                    self._pause()
+                    return
+                self._frame_results(*connection.recv())
+        except EOFError:
+            self._loop.remove_reader(connection.fileno())
+            self._results.remove(connection)
+            connection.close()
+            logging.error("Shard worker exited")
+
+    def _pause(self):
+        # The workers block on their next reply, their task pipes fill and the outboxes shed load
+        if self._paused:
+            return
+        self._paused = True
+        for connection in self._results:
+            self._loop.remove_reader(connection.fileno())
+        self._loop.call_later(RESUME_INTERVAL, self._resume)
+
+    def _resume(self):
+        if not self._paused or self._loop.is_closed():
+            return
+        if self.room() < self.reply_every:
+            self._loop.call_later(RESUME_INTERVAL, self._resume)
+            return
+        self._paused = False
+        for connection in self._results:
+            self._loop.add_reader(connection.fileno(), self._drain, connection)
+
+    def _frame_results(self, swaps, counts, tips):
+        totals = self.frame_counts
+        for index, count in enumerate(counts):
+            totals[index] += count
+        self.completed += counts[0]
+        if tips and self.on_tips is not None:
+            self.on_tips(tips)
+        on_swap = self.on_swap
+        if on_swap is None:
+            return
+        for swap in swaps:
+            try:
+                on_swap(swap)
+            except Exception as e:
+                logging.error(f"Error handling sharded swap {swap.tx_hash}: {e}")
+
+    @property
+    def outstanding(self):
+        """Frames submitted that were neither handled by a worker nor dropped from an outbox"""
+        dropped = sum(outbox.stats.dropped for outbox in self.outboxes)
+        return sum(self.submitted) - self.completed - dropped
+
+    def stats(self):
+        return {
+            'shards': self.shards,
+            'submitted': list(self.submitted),
+            'completed': self.completed,
+            'frames': dict(zip(('frames', 'swaps', 'filtered', 'errors', 'cpu'), self.frame_counts)),
+            'outboxes': {outbox.stats.name: outbox.stats.as_dict() for outbox in self.outboxes},
+            'pairs': len(self.table),
+        }
+
+    def close(self):
+        if self._loop is not None and not self._loop.is_closed():
+            for connection in self._results:
+                self._loop.remove_reader(connection.fileno())
+        self._paused = False
+        # A worker blocked on a reply gets a broken pipe instead of waiting on this loop
+        for connection in self._results:
+            connection.close()
+        # The exit request queues behind a batch that is still being written
+        for sender, connection in zip(self._senders, self._tasks):
+            sender.submit(_send_exit, connection)
+        for process in self._processes:
+            process.join(timeout = 2)
+            if process.is_alive():
+                process.terminate()
+        for sender in self._senders:
+            sender.shutdown(wait = True, cancel_futures = True)
+        for connection in self._tasks:
+            connection.close()
+        self._senders.clear()
+        self._processes.clear()
+        self._tasks.clear()
+        self._results.clear()
+        for table in self._retired:
+            table.close()
+        self._retired.clear()
+        self.table.close()
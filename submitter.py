@@ -0,0 +1,391 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import NamedTuple
+
+import websockets
+from eth_hash.auto import keccak
+
+import abi_tables
+import constant
+from rpc import RpcError
+from swap_decoder import function_selector
+
+
+class SignedTx(NamedTuple):
+    raw: bytes
+    hash: str
+    nonce: int
+    max_fee: int
+    priority_fee: int
+
+
+def _rlp_int(value):
+    return _rlp_bytes(value.to_bytes((value.bit_length() + 7) // 8, 'big'))
+
+
+def _rlp_bytes(value):
+    if len(value) == 1 and value[0] < 0x80:
+        return value
+    return _rlp_length(len(value), 0x80) + value
+
+
+def _rlp_list(items):
+    payload = b''.join(items)
+    return _rlp_length(len(payload), 0xc0) + payload
+
+
+def _rlp_length(length, offset):
+    if length < 56:
+        return bytes((offset + length,))
+    encoded = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes((offset + 55 + len(encoded),)) + encoded
+
+
+_EMPTY_ACCESS_LIST = _rlp_list(())
+
+
+def next_base_fee(base_fee, gas_used, gas_limit):
+    """EIP-1559 base fee of the block after a header with these values"""
+    target = gas_limit // 2
+    if target == 0 or gas_used == target:
+        return base_fee
+    if gas_used > target:
+        return base_fee + max(1, base_fee * (gas_used - target) // target // 8)
+    return base_fee - base_fee * (target - gas_used) // target // 8
+
+
+class NonceManager:
+    def __init__(self, rpc, address, stale_after = 60.0):
+        """
+        Local nonce counter for one account
+
+        next() hands out nonces without an RPC call. reconcile() compares
+        the local counter with the node's pending count: it jumps forward
+        when the key was used elsewhere and falls back when transactions
+        issued more than stale_after seconds ago never reached the pool.
+
+        Args:
+            rpc: RpcClient
+            address: Checksum address of the account
+            stale_after: Seconds before an unseen nonce is given up
+        """
+        self.rpc = rpc
+        self.address = address
+        self.stale_after = stale_after
+        self.nonce = None
+        self._issued_at = 0.0
+
+    async def _count(self, block):
+        return int(await self.rpc.request('eth_getTransactionCount', [self.address, block]), 16)
+
+    async def sync(self):
+        """Reset to the node's pending count"""
+        self.nonce = await self._count('pending')
+        return self.nonce
+
+    def next(self):
+        nonce = self.nonce
+        self.nonce += 1
+        self._issued_at = time.monotonic()
+        return nonce
+
+    def release(self, nonce):
+        """Give back the last nonce when its transaction was never sent"""
+        if nonce == self.nonce - 1:
+            self.nonce = nonce
+
+    async def reconcile(self):
+        pending = await self._count('pending')
+        if pending > self.nonce:
+            logging.info(f"Nonce behind the chain ({self.nonce} < {pending}), catching up")
+            self.nonce = pending
+        elif pending < self.nonce and time.monotonic() - self._issued_at > self.stale_after:
+            logging.info(f"Nonces {pending}..{self.nonce - 1} never reached the pool, reusing them")
+            self.nonce = pending
+        return self.nonce
+
+
+class FeeEstimator:
+    def __init__(self, priority_window = 512, percentile = 0.5, min_priority_fee = 10 ** 9, headroom_blocks = 2):
+        """
+        Rolling EIP-1559 fee estimate
+
+        The base fee of the next block follows from the latest newHeads
+        header, the priority fee is a percentile of the tips seen on recent
+        pending transactions. Both are plain attribute reads on the
+        decision path.
+
+        Args:
+            priority_window: Number of recent pending tips kept
+            percentile: Tip percentile to bid
+            min_priority_fee: Floor for the tip in wei
+            headroom_blocks: Full base fee increases maxFeePerGas covers
+        """
+        self.percentile = percentile
+        self.min_priority_fee = min_priority_fee
+        self.headroom_blocks = headroom_blocks
+
+        self.base_fee = None
+        self.next_base_fee = None
+        self.block_number = 0
+        self._tips = deque(maxlen = priority_window)
+        self._priority_fee = min_priority_fee
+        self._dirty = False
+        self.head_listeners = []
+
+    def add_head_listener(self, callback):
+        """callback(next_base_fee) after every header with a base fee"""
+        self.head_listeners.append(callback)
+
+    def on_head(self, header):
+        """Update from a newHeads / eth_getBlockByNumber header"""
+        base_fee = header.get('baseFeePerGas')
+        if base_fee is None:
+            return
+        self.base_fee = int(base_fee, 16)
+        self.next_base_fee = next_base_fee(self.base_fee, int(header['gasUsed'], 16), int(header['gasLimit'], 16))
+        self.block_number = int(header['number'], 16)
+        for callback in self.head_listeners:
+            callback(self.next_base_fee)
+
+    def observe_priority(self, tip):
+        self._tips.append(tip)
+        self._dirty = True
+
+    @property
+    def priority_fee(self):
+        if self._dirty:
+            tips = sorted(self._tips)
+            self._priority_fee = max(self.min_priority_fee, tips[int((len(tips) - 1) * self.percentile)])
+            self._dirty = False
+        return self._priority_fee
+
+    def fees(self, priority_fee = None):
+        """(maxFeePerGas, maxPriorityFeePerGas)"""
+        if self.next_base_fee is None:
+            raise RuntimeError("No block header seen yet")
+        priority_fee = self.priority_fee if priority_fee is None else priority_fee
+        max_base = self.next_base_fee
+        for _ in range(self.headroom_blocks - 1):
+            max_base += max_base // 8
+        return max_base + priority_fee, priority_fee
+
+
+class CalldataTemplate:
+    def __init__(self, entry, path, to):
+        """
+        Router calldata with the path and recipient encoded once
+
+        Every other input of a swap function is a uint256 head word, so
+        encode() only copies the template and writes those words in place.
+        """
+        inputs = entry['inputs']
+        head_size = 32 * len(inputs)
+        head = bytearray(head_size)
+        self.offsets = {}
+        for index, arg in enumerate(inputs):
+            position = 4 + 32 * index
+            if arg['type'] == 'address[]':
+                head[32 * index:32 * index + 32] = head_size.to_bytes(32, 'big')
+            elif arg['type'] == 'address':
+                head[32 * index + 12:32 * index + 32] = to
+            else:
+                self.offsets[arg['name']] = position
+
+        tail = len(path).to_bytes(32, 'big') + b''.join(bytes(12) + token for token in path)
+        self.method = entry['name']
+        self.data = bytes(function_selector(entry) + head + tail)
+
+    def encode(self, **amounts):
+        data = bytearray(self.data)
+        for name, value in amounts.items():
+            position = self.offsets[name]
+            data[position:position + 32] = value.to_bytes(32, 'big')
+        return bytes(data)
+
+
+def _load_signer(private_key):
+    """
+    (sign, checksum address) for a raw key, sign(digest) -> (v, r, s)
+
+    eth_keys and the key derivation are slow, so this runs once, off the
+    loop. The coincurve key object is kept and reused when coincurve is
+    installed, eth_keys' own coincurve backend rebuilds it on every call.
+    """
+    from eth_keys import keys
+    key = keys.PrivateKey(bytes(private_key))
+    address = key.public_key.to_checksum_address()
+    try:
+        import coincurve
+    except ImportError:
+        def sign(digest):
+            signature = key.sign_msg_hash(digest)
+            return signature.v, signature.r, signature.s
+        return sign, address
+
+    signing_key = coincurve.PrivateKey(bytes(private_key))
+
+    def sign(digest):
+        signature = signing_key.sign_recoverable(digest, hasher = None)
+        return signature[64], int.from_bytes(signature[:32], 'big'), int.from_bytes(signature[32:64], 'big')
+    return sign, address
+
+
+class Submitter:
+    def __init__(self, rpc, private_key, router_address = constant.ROUTER_ADDRESS, abi = None, gas_limit = 350_000):
+        """
+        Builds, signs and sends router swaps without RPC on the decision path
+
+        The key and address are derived once in start(), off the event
+        loop thread, so the mempool feed never waits for them. Nonces come
+        from a local NonceManager, fees from a FeeEstimator fed by newHeads
+        and pending transactions, and calldata from per (method, path, to)
+        templates. The EIP-1559 envelope is RLP-encoded here with the
+        constant fields pre-encoded and its hash signed directly, skipping
+        eth_account's transaction dict validation; with coincurve installed
+        a signature costs tens of microseconds.
+        Sending goes over the pooled, persistent RpcClient connection.
+
+        Args:
+            rpc: RpcClient used for sending and reconciliation
+            private_key: 32-byte key as returned by create_mainwallet
+            router_address: Router the swaps are sent to
+            abi: Router ABI the templates are compiled from, defaults to the precomputed table
+            gas_limit: Default gas limit per swap
+        """
+        self.rpc = rpc
+        self.private_key = private_key
+        self._sign = None
+        self.address = None
+        self.address_bytes = None
+        self.router_address = router_address
+        self.gas_limit = gas_limit
+        self.chain_id = None
+        self._chain_id_rlp = None
+        self._to_rlp = _rlp_bytes(bytes.fromhex(router_address[2:]))
+
+        self.nonces = NonceManager(rpc, None)
+        self.fees = FeeEstimator()
+
+        if abi is None:
+            abi = abi_tables.functions('ROUTER_ABI')
+        self._entries = {entry['name']: entry for entry in abi if entry.get('type') == 'function'}
+        self._templates = {}
+        self._reconciling = set()
+
+        # Counters
+        self.signed = 0
+        self.sent = 0
+        self.failed = 0
+
+    @property
+    def ready(self):
+        return self.chain_id is not None
+
+    async def start(self):
+        """Key, chain id, nonce and a first base fee, the only RPC reads before trading"""
+        self._sign, self.address = await asyncio.get_running_loop().run_in_executor(None, _load_signer, self.private_key)
+        self.nonces.address = self.address
+        self.address_bytes = bytes.fromhex(self.address[2:])
+        chain_id, _, header = await asyncio.gather(
+            self.rpc.chain_id(),
+            self.nonces.sync(),
+            self.rpc.request('eth_getBlockByNumber', ['latest', False]),
+        )
+        self.fees.on_head(header)
+        self._chain_id_rlp = _rlp_int(chain_id)
+        self.chain_id = chain_id
+        logging.info(f"Submitter ready: {self.address} nonce {self.nonces.nonce} chain {self.chain_id}")
+
+    def template(self, method, path, to = None):
+        key = (method, tuple(path), to)
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates[key] = CalldataTemplate(self._entries[method], path, to or self.address_bytes)
+        return template
+
+    def build_swap(self, method, path, value = 0, to = None, deadline = None, gas_limit = None, priority_fee = None, **amounts):
+        """
+        Signed router swap, ready to send
+
+        Args:
+            method: Router function name, e.g. swapExactETHForTokens
+            path: 20-byte token addresses
+            value: Wei sent along (ETH-in methods)
+            to: Recipient, defaults to the bot's own address
+            deadline: Unix time, defaults to two minutes from now
+            priority_fee: Tip override, defaults to the rolling estimate
+            amounts: uint256 inputs by ABI name, e.g. amountIn=..., amountOutMin=...
+        """
+        amounts['deadline'] = int(time.time()) + 120 if deadline is None else deadline
+        data = self.template(method, path, to).encode(**amounts)
+        max_fee, priority_fee = self.fees.fees(priority_fee)
+        nonce = self.nonces.next()
+        try:
+            fields = [
+                self._chain_id_rlp,
+                _rlp_int(nonce),
+                _rlp_int(priority_fee),
+                _rlp_int(max_fee),
+                _rlp_int(gas_limit or self.gas_limit),
+                self._to_rlp,
+                _rlp_int(value),
+                _rlp_bytes(data),
+                _EMPTY_ACCESS_LIST,
+            ]
+            v, r, s = self._sign(keccak(b'\x02' + _rlp_list(fields)))
+            fields += (_rlp_int(v), _rlp_int(r), _rlp_int(s))
+            raw = b'\x02' + _rlp_list(fields)
+        except Exception:
+            self.nonces.release(nonce)
+            raise
+        self.signed += 1
+        return SignedTx(raw, '0x' + keccak(raw).hex(), nonce, max_fee, priority_fee)
+
+    async def send(self, transaction):
+        """eth_sendRawTransaction, returns the tx hash"""
+        try:
+            tx_hash = await self.rpc.request('eth_sendRawTransaction', ['0x' + transaction.raw.hex()])
+        except RpcError as e:
+            self.failed += 1
+            message = str(e).lower()
+            if 'nonce too low' in message or 'nonce too high' in message:
+                await self.nonces.sync()
+            raise
+        self.sent += 1
+        return tx_hash
+
+    async def follow_heads(self, url, reconcile_every = 10):
+        """Keep the fee estimate current from newHeads, reconcile the nonce every few blocks"""
+        subscription = {"jsonrpc": "2.0", "method": "eth_subscribe", "params": ["newHeads"], "id": 3}
+        heads = 0
+        while True:
+            try:
+                async with websockets.connect(url) as websocket:
+                    await websocket.send(json.dumps(subscription))
+                    logging.info(f"newHeads subscription confirmed: {await websocket.recv()}")
+                    async for message in websocket:
+                        data = json.loads(message)
+                        if 'params' not in data:
+                            continue
+                        self.fees.on_head(data['params']['result'])
+                        heads += 1
+                        if heads % reconcile_every == 0:
+                            task = asyncio.get_running_loop().create_task(self._reconcile())
+                            self._reconciling.add(task)
+                            task.add_done_callback(self._reconciling.discard)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"newHeads subscription failed: {e}")
+                logging.info("Reconnecting in 5 seconds...")
+                await asyncio.sleep(5)
+
+    async def _reconcile(self):
+        try:
+            await self.nonces.reconcile()
+        except Exception as e:
+            logging.error(f"Nonce reconciliation failed: {e}")
@@ -0,0 +1,211 @@
+from typing import NamedTuple, Optional, Tuple
+
+import abi_tables
+
+
+# Router input names mapped onto the fields of SwapCall
+_AMOUNT_IN_NAMES = ('amountIn', 'amountInMax')
+_AMOUNT_OUT_NAMES = ('amountOutMin', 'amountOut')
+
+
+class SwapCall(NamedTuple):
+    """Decoded Uniswap V2 router swap call"""
+    method: str
+    amount_in: Optional[int]     # amountIn / amountInMax, None when paid in ETH (msg.value)
+    amount_out_min: int          # amountOutMin / exact amountOut
+    path: Tuple[bytes, ...]      # 20-byte token addresses
+    to: bytes                    # 20-byte recipient
+    deadline: int
+    exact_in: bool
+    eth_in: bool
+    eth_out: bool
+    fee_on_transfer: bool
+
+
+class _SwapLayout(NamedTuple):
+    """Head word offsets (in bytes, relative to the args) for one swap method"""
+    method: str
+    amount_in: int               # -1 when the method has no amountIn argument
+    amount_out: int
+    path: int
+    to: int
+    deadline: int
+    size: int                    # minimum calldata length of the static head
+    exact_in: bool
+    eth_in: bool
+    eth_out: bool
+    fee_on_transfer: bool
+
+
+def _compile_layout(entry):
+    names = [arg['name'] for arg in entry['inputs']]
+    types = [arg['type'] for arg in entry['inputs']]
+
+    def offset(candidates):
+        for name in candidates:
+            if name in names:
+                return names.index(name) * 32
+        return -1
+
+    name = entry['name']
+    layout = _SwapLayout(
+        method = name,
+        amount_in = offset(_AMOUNT_IN_NAMES),
+        amount_out = offset(_AMOUNT_OUT_NAMES),
+        path = offset(('path',)),
+        to = offset(('to',)),
+        deadline = offset(('deadline',)),
+        size = len(names) * 32,
+        exact_in = name.startswith('swapExact'),
+        eth_in = 'ETHFor' in name,
+        eth_out = 'ForETH' in name or 'ForExactETH' in name,
+        fee_on_transfer = name.endswith('SupportingFeeOnTransferTokens'),
+    )
+
+    if -1 in (layout.amount_out, layout.path, layout.to, layout.deadline):
+        raise ValueError(f"Unsupported swap signature: {name}({','.join(types)})")
+    return layout
+
+
+def canonical_type(arg):
+    """Canonical ABI type of an input, expanding tuple components"""
+    if arg['type'].startswith('tuple'):
+        components = ','.join(canonical_type(component) for component in arg['components'])
+        return f"({components}){arg['type'][5:]}"
+    return arg['type']
+
+
+def function_selector(entry):
+    """4-byte selector of an ABI function entry, precomputed for abi_tables entries"""
+    selector = entry.get('selector')
+    if selector is not None:
+        return selector
+    from eth_utils import keccak
+    signature = f"{entry['name']}({','.join(canonical_type(arg) for arg in entry['inputs'])})"
+    return keccak(text=signature)[:4]
+
+
+class SwapDecoder:
+    def __init__(self, abi = None):
+        """
+        Table-driven decoder for Uniswap V2 router swap calldata
+
+        The selector table is compiled once from the router ABI, decoding then
+        only slices fixed head offsets out of the calldata bytes.
+
+        Args:
+            abi: Router ABI, every function whose name starts with "swap" is
+                compiled, defaults to the precomputed router table
+        """
+        self.layouts = {}
+        if abi is None:
+            abi = abi_tables.functions('ROUTER_ABI')
+
+        for entry in abi:
+            if entry.get('type') != 'function' or not entry['name'].startswith('swap'):
+                continue
+            self.layouts[function_selector(entry)] = _compile_layout(entry)
+
+        # Hex selectors (no 0x) for callers that only hold the input string
+        self.hex_selectors = frozenset(selector.hex() for selector in self.layouts)
+        self._hex_layouts = {selector.hex(): layout for selector, layout in self.layouts.items()}
+
+    def is_swap(self, input_data):
+        """Check a hex ('0x...' or bare) or bytes calldata for a known swap selector"""
+        if isinstance(input_data, (bytes, bytearray, memoryview)):
+            return bytes(input_data[:4]) in self.layouts
+        if input_data.startswith('0x'):
+            return input_data[2:10] in self.hex_selectors
+        return input_data[:8] in self.hex_selectors
+
+    def decode_hex(self, input_data):
+        """Decode a hex calldata string, returns None for non-swap input"""
+        if not self.is_swap(input_data):
+            return None
+        if input_data.startswith('0x'):
+            input_data = input_data[2:]
+        try:
+            return self.decode(bytes.fromhex(input_data))
+        except ValueError:
+            return None
+
+    def first_hop(self, text, start):
+        """
+        (token_in, token_out) of a swap's first hop, read from hex calldata
+        in place without converting the rest of it
+
+        Args:
+            text: String holding the hex calldata, e.g. a raw JSON frame
+            start: Index of the selector's first hex digit in text
+
+        Returns:
+            Two 20-byte addresses, None for non-swap or malformed input
+        """
+        layout = self._hex_layouts.get(text[start:start + 8].lower())
+        if layout is None:
+            return None
+        args = start + 8
+        try:
+            head = args + 2 * layout.path
+            offset = args + 2 * int(text[head:head + 64], 16)
+            if int(text[offset:offset + 64], 16) < 2:
+                return None
+            first = offset + 64
+            token_in = bytes.fromhex(text[first + 24:first + 64])
+            token_out = bytes.fromhex(text[first + 88:first + 128])
+        except ValueError:
+            return None
+        if len(token_out) != 20:
+            return None
+        return token_in, token_out
+
+    def decode(self, calldata):
+        """
+        Decode swap calldata
+
+        Args:
+            calldata: Raw calldata bytes including the 4-byte selector
+
+        Returns:
+            SwapCall or None if the selector is unknown or the data is malformed
+        """
+        layout = self.layouts.get(bytes(calldata[:4]))
+        if layout is None:
+            return None
+
+        args = memoryview(calldata)[4:]
+        if len(args) < layout.size:
+            return None
+
+        from_bytes = int.from_bytes
+
+        # Dynamic address[] path: head holds the offset, then length, then items
+        path_offset = from_bytes(args[layout.path:layout.path + 32], 'big')
+        if path_offset + 32 > len(args):
+            return None
+        path_length = from_bytes(args[path_offset:path_offset + 32], 'big')
+        path_start = path_offset + 32
+        path_end = path_start + path_length * 32
+        if path_end > len(args):
+            return None
+        path = tuple(
+            bytes(args[position + 12:position + 32])
+            for position in range(path_start, path_end, 32)
+        )
+
+        amount_in = None
+        if layout.amount_in >= 0:
+            amount_in = from_bytes(args[layout.amount_in:layout.amount_in + 32], 'big')
+
+        return SwapCall(
+            layout.method,
+            amount_in,
+            from_bytes(args[layout.amount_out:layout.amount_out + 32], 'big'),
+            path,
+            bytes(args[layout.to + 12:layout.to + 32]),
+            from_bytes(args[layout.deadline:layout.deadline + 32], 'big'),
+            layout.exact_in,
+            layout.eth_in,
+            layout.eth_out,
+            layout.fee_on_transfer,
+        )
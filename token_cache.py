@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import sqlite3
+from typing import NamedTuple, Optional
+
+from multicall import MulticallError
+
+
+DECIMALS_SELECTOR = bytes.fromhex('313ce567')  # decimals()
+SYMBOL_SELECTOR = bytes.fromhex('95d89b41')    # symbol()
+
+
+class TokenInfo(NamedTuple):
+    decimals: Optional[int]
+    symbol: Optional[str]
+
+
+def decode_symbol(data):
+    """Decode symbol() returning either an ABI string or a bytes32 (MKR style)"""
+    if len(data) >= 64 and int.from_bytes(data[0:32], 'big') == 32:
+        length = int.from_bytes(data[32:64], 'big')
+        return data[64:64 + length].decode('utf-8', 'replace')
+    if len(data) == 32:
+        return data.rstrip(b'\0').decode('utf-8', 'replace')
+    return None
+
+
+def decode_decimals(data):
+    if len(data) < 32:
+        return None
+    value = int.from_bytes(data[0:32], 'big')
+    return value if value <= 255 else None
+
+
+class TokenCache:
+    def __init__(self, path, multicall, flush_interval = 5.0):
+        """
+        Token decimals/symbol cache persisted in sqlite
+
+        Everything on disk is loaded into a dict at startup. Unknown tokens are
+        fetched through the multicall batcher (decimals and symbol for all
+        tokens asked for together go out as one aggregate3) and written back
+        by a background task off the event loop.
+
+        Args:
+            path: sqlite file
+            multicall: MulticallBatcher used for lookups
+            flush_interval: Seconds between write-backs
+        """
+        self.path = path
+        self.multicall = multicall
+        self.flush_interval = flush_interval
+
+        self.tokens = {}
+        self._dirty = {}
+        self._in_flight = {}
+        self._prefetching = set()
+        self._flusher = None
+
+    def get(self, token):
+        """Cached TokenInfo for a 20-byte token address, None if unknown"""
+        return self.tokens.get(token)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS tokens (address BLOB PRIMARY KEY, decimals INTEGER, symbol TEXT)"
+        )
+        return connection
+
+    def _load(self):
+        connection = self._connect()
+        try:
+            return {
+                bytes(address): TokenInfo(decimals, symbol)
+                for address, decimals, symbol in connection.execute("SELECT address, decimals, symbol FROM tokens")
+            }
+        finally:
+            connection.close()
+
+    def _write(self, rows):
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO tokens (address, decimals, symbol) VALUES (?, ?, ?)",
+                    rows
+                )
+        finally:
+            connection.close()
+
+    async def load(self):
+        """Load the on-disk cache and start the write-back task"""
+        loop = asyncio.get_running_loop()
+        self.tokens.update(await loop.run_in_executor(None, self._load))
+        logging.info(f"Loaded {len(self.tokens)} tokens from {self.path}")
+        if self._flusher is None:
+            self._flusher = loop.create_task(self._flush_periodically())
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        rows = [(address, info.decimals, info.symbol) for address, info in self._dirty.items()]
+        self._dirty = {}
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, rows)
+        except sqlite3.Error as e:
+            logging.error(f"Error writing token cache: {e}")
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions = True)
+            self._flusher = None
+        if self._prefetching:
+            await asyncio.gather(*self._prefetching, return_exceptions = True)
+        await self.flush()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def ensure(self, tokens):
+        """
+        Make sure every token is cached, fetching the missing ones in one batch
+
+        Returns:
+            dict: token -> TokenInfo for the requested tokens
+        """
+        waits = []
+        missing = []
+        for token in dict.fromkeys(tokens):
+            if token in self.tokens:
+                continue
+            future = self._in_flight.get(token)
+            if future is None:
+                missing.append(token)
+            else:
+                waits.append(future)
+
+        if missing:
+            fetch = asyncio.ensure_future(self._fetch(missing))
+            for token in missing:
+                self._in_flight[token] = fetch
+            waits.append(fetch)
+
+        if waits:
+            await asyncio.gather(*waits, return_exceptions = True)
+        return {token: self.tokens.get(token) for token in tokens}
+
+    def prefetch(self, tokens):
+        """Start fetching unknown tokens without waiting"""
+        if any(token not in self.tokens and token not in self._in_flight for token in tokens):
+            task = asyncio.get_running_loop().create_task(self.ensure(tokens))
+            self._prefetching.add(task)
+            task.add_done_callback(self._prefetching.discard)
+
+    async def _fetch(self, tokens):
+        calls = []
+        for token in tokens:
+            calls.append((token, DECIMALS_SELECTOR))
+            calls.append((token, SYMBOL_SELECTOR))
+
+        try:
+            results = await self.multicall.call_many(calls)
+            for index, token in enumerate(tokens):
+                decimals, symbol = results[2 * index], results[2 * index + 1]
+                if isinstance(decimals, Exception) and not isinstance(decimals, MulticallError):
+                    # Transport failure, leave the token uncached so it is retried
+                    continue
+                info = TokenInfo(
+                    None if isinstance(decimals, Exception) else decode_decimals(decimals),
+                    None if isinstance(symbol, Exception) else decode_symbol(symbol),
+                )
+                self.tokens[token] = info
+                self._dirty[token] = info
+        finally:
+            for token in tokens:
+                self._in_flight.pop(token, None)
@@ -0,0 +1,568 @@
+import asyncio
+import logging
+import math
+import sqlite3
+import time
+from array import array
+from math import isqrt
+from typing import NamedTuple
+
+import abi_tables
+import amm_math
+from rpc import RpcError
+
+
+PAIR_CREATED_TOPIC = abi_tables.topic('PairCreated(address,address,address,uint256)')
+
+# -log(0.997), added to every edge
+FEE_WEIGHT = -math.log(amm_math.FEE_NUMERATOR / amm_math.FEE_DENOMINATOR)
+INF = float('inf')
+
+
+class Route(NamedTuple):
+    path: tuple                  # token addresses, token_in first
+    pairs: tuple                 # pair addresses, one per hop
+    amount_out: int
+
+
+class Cycle(NamedTuple):
+    tokens: tuple                # token ids, start token repeated at the end
+    pairs: tuple                 # pair ids in traversal order
+    weight: float                # sum of -log(rate), negative when the loop gains
+
+
+class Opportunity(NamedTuple):
+    path: tuple                  # token addresses, start token repeated at the end
+    pairs: tuple                 # pair addresses
+    amount_in: int
+    profit: int
+
+
+def decode_pair_created(log):
+    """(pair_index, token0, token1, pair) from a raw PairCreated log"""
+    topics = log['topics']
+    data = log['data']
+    if data.startswith('0x'):
+        data = data[2:]
+    return (
+        int(data[64:128], 16),
+        bytes.fromhex(topics[1][-40:]),
+        bytes.fromhex(topics[2][-40:]),
+        bytes.fromhex(data[24:64]),
+    )
+
+
+def edge_weights(reserve0, reserve1):
+    """(token0 -> token1, token1 -> token0) edge weights of a pair with these reserves"""
+    if reserve0 > 0 and reserve1 > 0:
+        spread = math.log(reserve0) - math.log(reserve1)
+        return spread + FEE_WEIGHT, FEE_WEIGHT - spread
+    return INF, INF
+
+
+class TokenGraph:
+    def __init__(self):
+        """
+        Compact adjacency index over Uniswap V2 pairs
+
+        Tokens and pairs are interned to dense integer ids. Per pair the two
+        token ids live in arrays, per token a dict maps neighbour token id
+        to pair id, so an edge lookup between two tokens is one dict get.
+        Every pair has two directed edges, edge 2*id is token0 -> token1 and
+        2*id+1 the reverse, weighted -log(rate after fee) so a route's
+        weight is the sum of its edges and a gaining loop sums below zero.
+        Pairs without known reserves weigh +inf.
+
+        The graph holds confirmed reserves only. Pending state is scored
+        through an overlay, a {pair id: (reserve0, reserve1)} dict passed to
+        edge(), which leaves the shared arrays untouched.
+        """
+        self.tokens = []
+        self.token_ids = {}
+        self.pairs = []
+        self.pair_ids = {}
+        self.token0 = array('I')
+        self.token1 = array('I')
+        self.neighbors = []
+        self.weights = array('d')
+        self.reserve0 = []
+        self.reserve1 = []
+
+        # Last block covered by the PairCreated scan
+        self.last_block = 0
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def token_id(self, token):
+        token_id = self.token_ids.get(token)
+        if token_id is None:
+            token_id = self.token_ids[token] = len(self.tokens)
+            self.tokens.append(token)
+            self.neighbors.append({})
+        return token_id
+
+    def add_pair(self, token0, token1, pair):
+        """Register a pair, returns its id (existing pairs keep theirs)"""
+        pair_id = self.pair_ids.get(pair)
+        if pair_id is not None:
+            return pair_id
+        pair_id = self.pair_ids[pair] = len(self.pairs)
+        id0, id1 = self.token_id(token0), self.token_id(token1)
+        self.pairs.append(pair)
+        self.token0.append(id0)
+        self.token1.append(id1)
+        self.neighbors[id0][id1] = pair_id
+        self.neighbors[id1][id0] = pair_id
+        self.weights.extend((INF, INF))
+        self.reserve0.append(0)
+        self.reserve1.append(0)
+        return pair_id
+
+    def pair_between(self, token_a, token_b):
+        """Pair id joining two token ids, None if there is none"""
+        return self.neighbors[token_a].get(token_b)
+
+    def update(self, pair, reserve0, reserve1):
+        """Rescore the two edges of one pair, returns its id or None for an unknown pair"""
+        pair_id = self.pair_ids.get(pair)
+        if pair_id is None:
+            return None
+        self.reserve0[pair_id] = reserve0
+        self.reserve1[pair_id] = reserve1
+        self.weights[2 * pair_id], self.weights[2 * pair_id + 1] = edge_weights(reserve0, reserve1)
+        return pair_id
+
+    def edge(self, pair_id, token_in, overlay = None):
+        """(weight, reserve_in, reserve_out) for crossing pair_id from token id token_in"""
+        if overlay is not None and pair_id in overlay:
+            reserve0, reserve1 = overlay[pair_id]
+            weight0, weight1 = edge_weights(reserve0, reserve1)
+            if self.token0[pair_id] == token_in:
+                return weight0, reserve0, reserve1
+            return weight1, reserve1, reserve0
+        if self.token0[pair_id] == token_in:
+            return self.weights[2 * pair_id], self.reserve0[pair_id], self.reserve1[pair_id]
+        return self.weights[2 * pair_id + 1], self.reserve1[pair_id], self.reserve0[pair_id]
+
+    def degree(self, token_id):
+        return len(self.neighbors[token_id])
+
+
+class RouteFinder:
+    def __init__(self, graph, base_tokens, hub_count = 32, min_gain = 0.0):
+        """
+        Multi-hop routes and arbitrage cycles over a TokenGraph
+
+        Routes of up to three hops are found by intersecting adjacency dicts,
+        three-hop routes go through the hub tokens (highest degree) in the
+        middle. Cycles are triangles through a base token (WETH) and are
+        kept incrementally: a confirmed reserve change only rescores the
+        triangles that contain the changed pair, found from its two tokens'
+        adjacency, and the set of gaining cycles is updated in place.
+        Pending reserves are scored with pending_cycles(), which reads the
+        pair through an overlay and changes neither the graph nor the set.
+
+        Args:
+            graph: TokenGraph
+            base_tokens: 20-byte addresses cycles have to start and end at
+            hub_count: Number of highest-degree tokens used as middle hops
+            min_gain: Keep cycles whose weight is below -min_gain
+        """
+        self.graph = graph
+        self.base_tokens = [graph.token_id(token) for token in base_tokens]
+        self.hub_count = hub_count
+        self.threshold = -min_gain
+        self.hubs = frozenset()
+
+        # (start token id, pair ids) -> Cycle, only cycles that gain
+        self.cycles = {}
+
+    def refresh_hubs(self):
+        graph = self.graph
+        ranked = sorted(range(len(graph.tokens)), key = graph.degree, reverse = True)
+        self.hubs = frozenset(ranked[:self.hub_count])
+
+    def update(self, pair, reserves):
+        """
+        ReserveStore update listener: rescore one pair and the cycles through it
+
+        Returns:
+            Gaining cycles through the pair after the update
+        """
+        graph = self.graph
+        if reserves is None:
+            pair_id = graph.update(pair, 0, 0)
+        else:
+            pair_id = graph.update(pair, reserves[0], reserves[1])
+        if pair_id is None:
+            return []
+        return self._rescore(pair_id)
+
+    def cycles_through(self, pair):
+        pair_id = self.graph.pair_ids.get(pair)
+        if pair_id is None:
+            return []
+        return [cycle for cycle in self._triangles(pair_id) if cycle.weight < self.threshold]
+
+    def overlay(self, reserves):
+        """{pair id: (reserve0, reserve1)} from {pair address: reserves}, unknown pairs dropped"""
+        pair_ids = self.graph.pair_ids
+        return {
+            pair_ids[pair]: (values[0], values[1]) if values is not None else (0, 0)
+            for pair, values in reserves.items()
+            if pair in pair_ids
+        }
+
+    def pending_cycles(self, pair, reserves):
+        """
+        Gaining cycles through a pair if it were at `reserves`, e.g. its
+        projection after pending swaps, with every other pair confirmed
+
+        Returns:
+            (cycles, overlay), pass the overlay to opportunity() to size them
+        """
+        overlay = self.overlay({pair: reserves})
+        if not overlay:
+            return [], overlay
+        pair_id, = overlay
+        cycles = [cycle for cycle in self._triangles(pair_id, overlay) if cycle.weight < self.threshold]
+        return cycles, overlay
+
+    def _triangles(self, pair_id, overlay = None):
+        graph = self.graph
+        neighbors = graph.neighbors
+        token_a, token_b = graph.token0[pair_id], graph.token1[pair_id]
+
+        for base in self.base_tokens:
+            if base == token_a or base == token_b:
+                # Base pair: close the triangle over every token both ends share
+                other = token_b if base == token_a else token_a
+                base_neighbors, other_neighbors = neighbors[base], neighbors[other]
+                if len(other_neighbors) > len(base_neighbors):
+                    shared = (token for token in base_neighbors if token in other_neighbors)
+                else:
+                    shared = (token for token in other_neighbors if token in base_neighbors)
+                for middle in shared:
+                    if middle == base:
+                        continue
+                    yield from self._loops(base, other, middle, overlay)
+            else:
+                yield from self._loops(base, token_a, token_b, overlay)
+
+    def _loops(self, base, token_a, token_b, overlay = None):
+        # base -> a -> b -> base and the reverse
+        graph = self.graph
+        edge = graph.edge
+        first = graph.pair_between(base, token_a)
+        middle = graph.pair_between(token_a, token_b)
+        last = graph.pair_between(token_b, base)
+        if first is None or middle is None or last is None:
+            return
+        yield Cycle(
+            (base, token_a, token_b, base),
+            (first, middle, last),
+            edge(first, base, overlay)[0] + edge(middle, token_a, overlay)[0] + edge(last, token_b, overlay)[0]
+        )
+        yield Cycle(
+            (base, token_b, token_a, base),
+            (last, middle, first),
+            edge(last, base, overlay)[0] + edge(middle, token_b, overlay)[0] + edge(first, token_a, overlay)[0]
+        )
+
+    def _rescore(self, pair_id):
+        cycles = self.cycles
+        gaining = []
+        for cycle in self._triangles(pair_id):
+            key = (cycle.tokens[0], cycle.pairs)
+            if cycle.weight < self.threshold:
+                cycles[key] = cycle
+                gaining.append(cycle)
+            else:
+                cycles.pop(key, None)
+        return gaining
+
+    def best_cycles(self, limit = 10):
+        return sorted(self.cycles.values(), key = lambda cycle: cycle.weight)[:limit]
+
+    def opportunity(self, cycle, overlay = None):
+        """
+        Size a cycle: the hops fold into one virtual constant-product pool
+        whose optimum is closed form, the profit is then replayed exactly.
+        Pairs in the overlay are read at their overlaid reserves.
+        """
+        graph = self.graph
+        hops = []
+        for token_in, pair_id in zip(cycle.tokens, cycle.pairs):
+            _, reserve_in, reserve_out = graph.edge(pair_id, token_in, overlay)
+            if reserve_in <= 0 or reserve_out <= 0:
+                return None
+            hops.append((reserve_in, reserve_out))
+
+        numerator, denominator = amm_math.FEE_NUMERATOR, amm_math.FEE_DENOMINATOR
+        virtual_in, virtual_out = hops[0]
+        for reserve_in, reserve_out in hops[1:]:
+            scale = denominator * reserve_in + numerator * virtual_out
+            virtual_in = virtual_in * reserve_in * denominator // scale
+            virtual_out = numerator * virtual_out * reserve_out // scale
+        if virtual_in <= 0 or virtual_out <= 0:
+            return None
+
+        amount_in = (isqrt(numerator * denominator * virtual_in * virtual_out) - denominator * virtual_in) // numerator
+        if amount_in <= 0:
+            return None
+        amount = amount_in
+        for reserve_in, reserve_out in hops:
+            amount = amm_math.get_amount_out(amount, reserve_in, reserve_out)
+
+        return Opportunity(
+            tuple(graph.tokens[token] for token in cycle.tokens),
+            tuple(graph.pairs[pair_id] for pair_id in cycle.pairs),
+            amount_in,
+            amount - amount_in
+        )
+
+    def _candidates(self, token_in, token_out, max_hops):
+        graph = self.graph
+        neighbors = graph.neighbors
+        in_neighbors, out_neighbors = neighbors[token_in], neighbors[token_out]
+
+        direct = in_neighbors.get(token_out)
+        if direct is not None:
+            yield (token_in, token_out), (direct,)
+        if max_hops < 2:
+            return
+
+        small, large = (in_neighbors, out_neighbors) if len(in_neighbors) <= len(out_neighbors) else (out_neighbors, in_neighbors)
+        for middle in small:
+            if middle in large and middle != token_in and middle != token_out:
+                yield (token_in, middle, token_out), (in_neighbors[middle], out_neighbors[middle])
+        if max_hops < 3:
+            return
+
+        if not self.hubs:
+            self.refresh_hubs()
+        first_hubs = [hub for hub in self.hubs if hub in in_neighbors and hub != token_out]
+        last_hubs = [hub for hub in self.hubs if hub in out_neighbors and hub != token_in]
+        for first in first_hubs:
+            first_neighbors = neighbors[first]
+            for last in last_hubs:
+                if first != last and last in first_neighbors:
+                    yield (token_in, first, last, token_out), (in_neighbors[first], first_neighbors[last], out_neighbors[last])
+
+    def best_routes(self, token_in, token_out, amount_in, max_hops = 3, limit = 3, shortlist = 16):
+        """
+        Best routes by exact output, up to max_hops
+
+        Candidates are ranked by their summed edge weight first, only the
+        shortlist is replayed with exact integer math.
+        """
+        graph = self.graph
+        start, end = graph.token_ids.get(token_in), graph.token_ids.get(token_out)
+        if start is None or end is None:
+            return []
+
+        ranked = []
+        for path, pairs in self._candidates(start, end, max_hops):
+            weight = sum(graph.edge(pair_id, token)[0] for token, pair_id in zip(path, pairs))
+            if weight < INF:
+                ranked.append((weight, path, pairs))
+        ranked.sort(key = lambda candidate: candidate[0])
+
+        routes = []
+        for _, path, pairs in ranked[:shortlist]:
+            amount = amount_in
+            for token, pair_id in zip(path, pairs):
+                _, reserve_in, reserve_out = graph.edge(pair_id, token)
+                amount = amm_math.get_amount_out(amount, reserve_in, reserve_out)
+            if amount > 0:
+                routes.append(Route(
+                    tuple(graph.tokens[token] for token in path),
+                    tuple(graph.pairs[pair_id] for pair_id in pairs),
+                    amount
+                ))
+        routes.sort(key = lambda route: route.amount_out, reverse = True)
+        return routes[:limit]
+
+
+class PairIndexer:
+    def __init__(
+        self,
+        rpc,
+        graph,
+        factory,
+        path,
+        start_block = 10_000_835,
+        block_range = 5_000,
+        concurrency = 4,
+        confirmations = 12,
+        checkpoint_interval = 10.0,
+        on_pair = None):
+        """
+        Fills a TokenGraph from the factory's PairCreated logs
+
+        Pairs are persisted in sqlite together with the last scanned block,
+        a restart only scans the blocks after that checkpoint. History is
+        read with eth_getLogs over block windows, several windows in flight
+        and applied in order. A window the node rejects (too many results,
+        range limit) is halved and retried, the size grows back afterwards.
+        PairCreated is read confirmations blocks late, so on_pair gets every
+        pair as it enters the graph, e.g. to seed reserves that Synced first.
+
+        Args:
+            rpc: RpcClient
+            graph: TokenGraph to fill
+            factory: Factory address
+            path: sqlite file
+            start_block: Factory deployment block
+            block_range: Initial blocks per eth_getLogs call
+            concurrency: eth_getLogs calls in flight
+            confirmations: Blocks behind head that are scanned
+            checkpoint_interval: Seconds between checkpoints during a scan
+            on_pair: Called with the 20-byte address of each pair added to the graph
+        """
+        self.rpc = rpc
+        self.graph = graph
+        self.factory = factory if isinstance(factory, str) else '0x' + factory.hex()
+        self.path = path
+        self.start_block = start_block
+        self.block_range = block_range
+        self.max_block_range = block_range
+        self.concurrency = concurrency
+        self.confirmations = confirmations
+        self.checkpoint_interval = checkpoint_interval
+        self.on_pair = on_pair
+
+        # (pair_index, pair, token0, token1) not yet on disk
+        self._unsaved = []
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS pairs (id INTEGER PRIMARY KEY, pair BLOB, token0 BLOB, token1 BLOB)"
+        )
+        connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+        return connection
+
+    def _load(self):
+        connection = self._connect()
+        try:
+            rows = connection.execute("SELECT pair, token0, token1 FROM pairs ORDER BY id").fetchall()
+            row = connection.execute("SELECT value FROM meta WHERE key = 'last_block'").fetchone()
+            return rows, row[0] if row else 0
+        finally:
+            connection.close()
+
+    def _write(self, rows, last_block):
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO pairs (id, pair, token0, token1) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_block', ?)",
+                    (last_block,)
+                )
+        finally:
+            connection.close()
+
+    async def load(self):
+        """Load the checkpointed pairs into the graph"""
+        rows, last_block = await asyncio.get_running_loop().run_in_executor(None, self._load)
+        graph = self.graph
+        for pair, token0, token1 in rows:
+            self._add(bytes(token0), bytes(token1), bytes(pair))
+        graph.last_block = max(graph.last_block, last_block)
+        logging.info(f"Loaded {len(rows)} pairs from {self.path}, scanned up to block {last_block}")
+
+    async def checkpoint(self):
+        rows, self._unsaved = self._unsaved, []
+        await asyncio.get_running_loop().run_in_executor(None, self._write, rows, self.graph.last_block)
+
+    async def _get_logs(self, from_block, to_block):
+        return await self.rpc.request('eth_getLogs', [{
+            'address': self.factory,
+            'topics': [PAIR_CREATED_TOPIC],
+            'fromBlock': hex(from_block),
+            'toBlock': hex(to_block),
+        }])
+
+    def _add(self, token0, token1, pair):
+        if pair in self.graph.pair_ids:
+            return
+        self.graph.add_pair(token0, token1, pair)
+        if self.on_pair is not None:
+            self.on_pair(pair)
+
+    def _apply(self, logs, to_block):
+        graph = self.graph
+        for log in logs:
+            if log.get('removed'):
+                continue
+            pair_index, token0, token1, pair = decode_pair_created(log)
+            self._add(token0, token1, pair)
+            self._unsaved.append((pair_index, pair, token0, token1))
+        graph.last_block = to_block
+
+    async def scan(self, head = None):
+        """
+        Scan from the checkpoint up to head - confirmations
+
+        Returns:
+            Number of pairs added
+        """
+        if head is None:
+            head = await self.rpc.block_number()
+        target = head - self.confirmations
+        graph = self.graph
+        graph.last_block = max(graph.last_block, self.start_block - 1)
+        before = len(graph)
+        last_checkpoint = time.monotonic()
+
+        while graph.last_block < target:
+            start = max(graph.last_block + 1, self.start_block)
+            windows = []
+            for _ in range(self.concurrency):
+                if start > target:
+                    break
+                end = min(start + self.block_range - 1, target)
+                windows.append((start, end))
+                start = end + 1
+
+            results = await asyncio.gather(
+                *(self._get_logs(start, end) for start, end in windows),
+                return_exceptions = True
+            )
+            for (start, end), logs in zip(windows, results):
+                if isinstance(logs, Exception):
+                    if not isinstance(logs, (RpcError, asyncio.TimeoutError)) or self.block_range == 1:
+                        raise logs
+                    self.block_range = max(1, self.block_range // 2)
+                    logging.info(f"eth_getLogs {start}-{end} failed ({logs}), block range now {self.block_range}")
+                    break
+                self._apply(logs, end)
+            else:
+                self.block_range = min(self.max_block_range, self.block_range * 2)
+
+            if time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                await self.checkpoint()
+                last_checkpoint = time.monotonic()
+                logging.info(f"Pair index at block {graph.last_block}: {len(graph)} pairs")
+
+        await self.checkpoint()
+        return len(graph) - before
+
+    async def follow(self, poll_interval = 12.0):
+        """Catch up, then keep picking up new pairs"""
+        while True:
+            try:
+                added = await self.scan()
+                if added:
+                    logging.info(f"Pair index: {added} new pairs, {len(self.graph)} total")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Pair index scan failed: {e}")
+            await asyncio.sleep(poll_interval)
@@ -3,11 +3,23 @@ import logging
 import asyncio
 import websockets
 import json
+import time
 import constant
-from hexbytes import HexBytes
 from pathlib import Path
-from web3 import Web3
-from eth_account import Account
+from swap_decoder import SwapDecoder
+from reserves import ReserveStore, Reserves, SWAP_TOPIC, decode_swap_log
+from multicall import MulticallBatcher
+from pipeline import TxPipeline
+from pending_tx import PendingTxParser, address_bytes, swap_volume
+from mempool_feed import MempoolFanIn
+from rpc import RpcClient
+from pair_address import PairResolver
+from token_cache import TokenCache
+from metrics import Metrics
+from pending_state import PendingStateOverlay, evaluate_swap
+from sharding import REPLY_EVERY, FrameConfig, ShardedEvaluator
+from token_graph import TokenGraph, RouteFinder, PairIndexer
+from submitter import Submitter
 
 # Configure logging
 # logging.basicConfig(
@@ -57,6 +69,31 @@ def create_mainwallet(filename='private_key.bin'):
     return private_key_bytes
 
 
+_contracts = {}
+_web3 = None
+
+
+def shared_web3():
+    """Offline AsyncWeb3 for building contract objects, web3 is imported on first use"""
+    global _web3
+    if _web3 is None:
+        from web3 import AsyncWeb3
+        _web3 = AsyncWeb3()
+    return _web3
+
+
+def shared_contract(w3, address, abi_name):
+    """Contract object for (address, ABI), built once per process and shared"""
+    key = (address.lower(), abi_name)
+    contract = _contracts.get(key)
+    if contract is None:
+        contract = _contracts[key] = w3.eth.contract(
+            address = w3.to_checksum_address(address),
+            abi = getattr(constant, abi_name)
+        )
+    return contract
+
+
 class UniswapV2Monitor:
     def __init__(
         self, 
@@ -67,46 +104,38 @@ class UniswapV2Monitor:
         filter_volume = constant.FILTER_VOLUME,
         filter_slippage = constant.FILTER_SLIPPAGE,
         weth_address = constant.WETH_ADDRESS,
-        multicall_address = constant.MULTICALL_ADDRESS):
+        multicall_address = constant.MULTICALL_ADDRESS,
+        mempool_sockets = None,
+        private_key = None):
         """
         Monitor Uniswap V2 swap transactions
         
         Args:
             web3_provider: Web3 HTTP/WebSocket provider URL
+            mempool_sockets: Websocket URLs whose pending tx feeds are merged, defaults to the provider socket
+            private_key: 32-byte key from create_mainwallet, enables transaction submission
         """
         
-        print(f"here ! {web3_provicer_socket}")
-        
-        self.w3 = Web3(Web3.LegacyWebSocketProvider(web3_provicer_socket))
+        # Pooled, pipelined JSON-RPC for everything on the async path
+        self.rpc = RpcClient(
+            web3_provider,
+            pool_size = constant.RPC_POOL_SIZE,
+            timeout = constant.RPC_TIMEOUT
+        )
         
-        if not self.w3.is_connected():
-            print("❌ Connection failed")
-            exit()
-
-        print("✅ Connected to Ethereum mainnet")
-
         self.w3soc = web3_provicer_socket
                 
         # Uniswap V2 Router address
         self.router_address = router_address
-        self.router_contract = self.w3.eth.contract(
-            address = self.router_address,
-            abi = constant.ROUTER_ABI
-        )
         
         # Uniswap V2 Factory address
         self.factory_address = factory_address
-        self.factory_contract = self.w3.eth.contract(
-            address = self.factory_address,
-            abi = constant.FACTORY_ABI
-        )
         
         # Uniswap Multicall address
         self.multicall_address = multicall_address
-        self.multicall_contract = self.w3.eth.contract(
-            address = self.multicall_address,
-            abi = constant.MULTICALL3_ABI
-        )
+        
+        # Concurrent reads are coalesced into aggregate3 calls
+        self.multicall = MulticallBatcher(self.rpc.eth_call, self.multicall_address)
                 
         # Transaction Volume Thresold(Ether amount, over $10k)
         self.filter_volume = filter_volume
@@ -116,25 +145,160 @@ class UniswapV2Monitor:
         
         # WETH address
         self.weth_address = weth_address
+        self.weth = address_bytes(weth_address)
+        
+        # Per-stage latency histograms and counters
+        self.metrics = Metrics()
+        
+        # Bounded reader -> workers -> decision pipeline for pending txs
+        self.pipeline = TxPipeline(
+            self.handle_pending_tx_async,
+            self.handle_swap_detected,
+            workers = constant.PIPELINE_WORKERS,
+            parse_queue_size = constant.PARSE_QUEUE_SIZE,
+            decision_queue_size = constant.DECISION_QUEUE_SIZE,
+            parse_policy = constant.DROP_POLICY,
+            decision_policy = constant.DROP_POLICY
+        )
         
+        # Selector table for router swap calldata, compiled once
+        self.swap_decoder = SwapDecoder()
+        
+        # CREATE2 pair addresses, no RPC per lookup
+        self.pair_resolver = PairResolver(self.factory_address)
+        
+        # Raw frame pre-check and lazy PendingTx records
+        self.tx_parser = PendingTxParser(self.router_address, self.swap_decoder, self.pair_resolver)
+        
+        # Pair reserves mirrored from Sync logs, keyed by 20-byte pair address
+        self.reserve_store = ReserveStore()
+        
+        # Pending router swaps projected over the confirmed reserves
+        self.pending_state = PendingStateOverlay()
+        
+        # Optional: frame parsing, overlays and swap evaluation on worker processes sharded by pair
+        self.sharded = None
+        if constant.EVAL_SHARDS > 0:
+            decision_queue = self.pipeline.decision_queue
+            # Frames wait in bounded per-shard outboxes instead of the parse queue, same size and policy
+            self.sharded = ShardedEvaluator(
+                constant.EVAL_SHARDS,
+                FrameConfig(self.router_address, self.weth, self.filter_volume),
+                constant.RESERVE_TABLE_SLOTS,
+                on_swap = self.handle_sharded_swap,
+                on_tips = self.observe_tips,
+                room = lambda: decision_queue.maxsize - len(decision_queue),
+                outbox_size = constant.PARSE_QUEUE_SIZE,
+                policy = constant.DROP_POLICY,
+                # A whole reply has to fit the decision queue, or reading would never resume
+                reply_every = max(1, min(REPLY_EVERY, constant.DECISION_QUEUE_SIZE // 2))
+            )
+            self.reserve_store.add_update_listener(self.sharded.update)
+            self.reserve_store.add_swap_listener(
+                lambda event: self.sharded.mined(event.transaction_hash, event.pair)
+            )
+            self.metrics.gauge('shard_submitted', lambda: dict(enumerate(self.sharded.submitted)))
+            self.metrics.gauge('shard_frames', lambda: self.sharded.stats()['frames'])
+        else:
+            self.reserve_store.add_swap_listener(
+                lambda event: self.pending_state.mined(event.transaction_hash)
+            )
+        
+        # Pending txs from every endpoint, first-seen wins. Sharded, frames go to the
+        # workers as pre-checked strings, otherwise they are parsed here for the pipeline
+        self.mempool_feed = MempoolFanIn(
+            mempool_sockets or [web3_provicer_socket],
+            self.subscribe_to_pending_txs,
+            self.tx_parser.parse if self.sharded is None else self.tx_parser.route,
+            self.pipeline.submit if self.sharded is None else self.sharded.submit_frame,
+            compression = None if constant.MEMPOOL_COMPRESSION == 'off' else constant.MEMPOOL_COMPRESSION
+        )
+        
+        self.metrics.gauge('frames', lambda: {'received': self.tx_parser.frames, 'rejected': self.tx_parser.rejected})
+        self.metrics.gauge('queue_depth', lambda: {name: stats['depth'] for name, stats in self.queue_stats().items()})
+        self.metrics.gauge('queue_dropped', lambda: {name: stats['dropped'] for name, stats in self.queue_stats().items()})
+        self.metrics.gauge('feed_first_seen', lambda: {url: stats.first_seen for url, stats in self.mempool_feed.stats.items()})
+        
+        # Token metadata, no RPC per lookup
+        self.token_cache = TokenCache(constant.TOKEN_CACHE_PATH, self.multicall)
+        
+        # Every known V2 pair from PairCreated logs, cycles through WETH rescored per reserve change
+        self.token_graph = TokenGraph()
+        self.route_finder = RouteFinder(self.token_graph, [address_bytes(self.weth_address)])
+        self.pair_indexer = PairIndexer(
+            self.rpc,
+            self.token_graph,
+            self.factory_address,
+            constant.PAIR_INDEX_PATH,
+            start_block = constant.FACTORY_START_BLOCK,
+            block_range = constant.GET_LOGS_BLOCK_RANGE,
+            on_pair = self.seed_pair
+        )
+        self.reserve_store.add_update_listener(self.route_finder.update)
+        self.metrics.gauge('graph', lambda: {'pairs': len(self.token_graph), 'cycles': len(self.route_finder.cycles)})
+        
+        # Signed swaps ready without an RPC round-trip, sent over the pooled connection
+        self.submitter = None
+        if private_key is not None:
+            self.submitter = Submitter(self.rpc, private_key, self.router_address, gas_limit = constant.SWAP_GAS_LIMIT)
+            self.metrics.gauge('submitted', lambda: {
+                'signed': self.submitter.signed, 'sent': self.submitter.sent, 'failed': self.submitter.failed
+            })
+            # Pending swaps are ordered by their effective tip against the next base fee
+            self.submitter.fees.add_head_listener(
+                self.pending_state.set_base_fee if self.sharded is None else self.sharded.set_base_fee
+            )
+        
+      
+    # web3 and the contract objects are only built when something uses them
+    @property
+    def w3(self):
+        return shared_web3()
+    
+    @property
+    def router_contract(self):
+        return shared_contract(self.w3, self.router_address, 'ROUTER_ABI')
+    
+    @property
+    def factory_contract(self):
+        return shared_contract(self.w3, self.factory_address, 'FACTORY_ABI')
+    
+    @property
+    def multicall_contract(self):
+        return shared_contract(self.w3, self.multicall_address, 'MULTICALL3_ABI')
+      
+    async def connect(self, timeout = constant.RPC_TIMEOUT):
+        """
+        Check the RPC endpoint without blocking the event loop
+        
+        Raises:
+            ConnectionError: The endpoint did not answer eth_chainId in time
+        """
+        try:
+            chain_id = await self.rpc.chain_id(timeout = timeout)
+        except Exception as e:
+            print("❌ Connection failed")
+            raise ConnectionError(f"RPC endpoint unreachable: {e}") from e
+
+        print(f"✅ Connected to chain {chain_id}")
+        return chain_id
       
     def decode_swap_event(self, log):
         """Decode Uniswap V2 Swap event from log"""
         try:
-            # Create contract instance for decoding
-            contract = self.w3.eth.contract(abi=self.pair_abi)
+            if log['topics'][0] != SWAP_TOPIC:
+                return None
             
-            # Decode the log
-            decoded_log = contract.events.Swap().processLog(log)
+            decoded_log = decode_swap_log(log)
             
             swap_data = {
                 'pair_address': log['address'],
-                'sender': decoded_log['args']['sender'],
-                'to': decoded_log['args']['to'],
-                'amount0In': decoded_log['args']['amount0In'],
-                'amount1In': decoded_log['args']['amount1In'],
-                'amount0Out': decoded_log['args']['amount0Out'],
-                'amount1Out': decoded_log['args']['amount1Out'],
+                'sender': decoded_log.sender,
+                'to': decoded_log.to,
+                'amount0In': decoded_log.amount0_in,
+                'amount1In': decoded_log.amount1_in,
+                'amount0Out': decoded_log.amount0_out,
+                'amount1Out': decoded_log.amount1_out,
             }
             
             return swap_data
@@ -144,72 +308,152 @@ class UniswapV2Monitor:
             return None
         
     def check_swap(self, input_data):
-        
-        swap_signatures = [
-            'fb3bdb41', #swapETHForExactTokens
-            '7ff36ab5', #swapExactETHForTOkens
-            'b6f9de95', #swapExactETHForTOkens
-            #'18cbafe5', #swapExactETHForTOkens
-            #'791ac947', #swapExactETHForTOkens
-            #'38ed1739', #swapExactETHForTOkens
-            #'4a25d94a', #swapExactETHForTOkens
-        ]
-        
-        for sig in swap_signatures:
-            if input_data.startswith(sig):
-                return True
-        return False
+        return self.swap_decoder.is_swap(input_data)
             
     async def handle_pending_tx_async(self, transaction):
         """Parse swap transaction details"""
         
+        metrics = self.metrics
+        
         try:
+            
+            started = time.perf_counter()
+            metrics.observe('parse', transaction.parsed_at - transaction.received_at)
+            metrics.observe('queue', started - transaction.parsed_at)
+            
+            # Competing router txs set the tip to bid
+            if self.submitter is not None and transaction.max_priority_fee is not None:
+                self.submitter.fees.observe_priority(transaction.max_priority_fee)
                         
-            print(transaction['hash'])
+            # Router address and selector were checked on the raw frame
+            swap_call = transaction.swap
             
+            decoded = time.perf_counter()
+            metrics.observe('decode', decoded - started)
             
-            # Check if transaction is to Uniswap Router
-            if not transaction['to'] or transaction['to'].lower() != self.router_address.lower():
+            if swap_call is None:
+                metrics.inc('not_swap')
                 return None
-                        
-            # Check if transaction has swap method signatures
-            input_data = transaction['input']
             
-            swap_flag = self.check_swap(input_data)         
+            metrics.inc('swaps')
             
-            if swap_flag == False:
+            # Every swap moves the pair, so the overlay sees it before the volume filter
+            pair = self.pair_resolver.pair_for(swap_call.path[0], swap_call.path[1])
+            swap = self.pending_state.add_swap_call(
+                transaction.hash,
+                transaction.sender,
+                transaction.nonce,
+                transaction.gas_priority,
+                transaction.tip_cap,
+                transaction.value,
+                swap_call,
+                pair
+            )
+            
+            volume = swap_volume(transaction.value, swap_call, self.weth)
+            if volume < self.filter_volume:
+                metrics.inc('filtered')
+                metrics.observe('filter', time.perf_counter() - decoded)
                 return None
             
-            print("swap tx")  
+            metrics.observe('filter', time.perf_counter() - decoded)
                         
             swap_info = {
-                'tx_hash': transaction['hash'],
-                'block_number': transaction['blockNumber'],
-                'from_address': transaction['from'],
-                'to_address': transaction['to'],
-                'gas_price': transaction['gasPrice'],
-                'value': transaction['value'],  # ETH value sent
-                'out': int(input_data[8:72], 16),
-                'token': input_data[8+64*5:]
+                'tx_hash': transaction.hash,
+                'block_number': transaction.block_number,
+                'from_address': transaction.sender,
+                'to_address': transaction.to,
+                'gas_price': transaction.gas_price,
+                'gas_priority': transaction.gas_priority,
+                'value': transaction.value,  # ETH value sent
+                'volume': volume,  # ETH or WETH going in
+                'swap': swap_call,
+                'out': swap_call.amount_out_min,
+                'token': swap_call.path[-1],
+                'pair': pair,
+                'received_at': transaction.received_at
             }
             
-            print(swap_info['tx_hash'])
-            print(f"eth value: {swap_info['value']}")
-            print(f"token amount: {swap_info['out']}")
-                        
-            if swap_info['value'] < self.filter_volume:
-                return None
-                        
-            
+            reserves = self.reserve_store.get(pair)
+            swap_info['reserves'] = reserves
+            swap_info['projected'] = self.pending_state.project(pair, reserves)
+            swap_info['evaluation'] = None
+            if swap is not None and reserves is not None:
+                swap_info['evaluation'] = evaluate_swap(
+                    swap, *self.pending_state.project_before(pair, reserves, transaction.hash)
+                )
+            self.complete_swap(swap_info)
+            metrics.observe('evaluate', time.perf_counter() - decoded)
             
-            
-            
-                       
+            return swap_info
             
         except Exception as e:
-            logging.error(f"Error parsing transaction {transaction['hash']}: {e}")
+            metrics.inc('errors')
+            logging.error(f"Error parsing transaction {transaction.hash}: {e}")
             return None
-            
+    
+    def queue_stats(self):
+        """Pipeline stage stats, plus the per-shard outboxes that replace the parse queue when sharded"""
+        stats = self.pipeline.stats()
+        if self.sharded is not None:
+            stats.update(self.sharded.stats()['outboxes'])
+        return stats
+
+    def handle_sharded_swap(self, swap):
+        """A ShardedSwap that passed the filter on a worker, straight to the decision queue"""
+        swap_call = swap.swap_call
+        swap_info = {
+            'tx_hash': swap.tx_hash,
+            'block_number': swap.block_number,
+            'from_address': swap.sender,
+            'to_address': swap.to,
+            'gas_price': swap.gas_price,
+            'gas_priority': swap.gas_priority,
+            'value': swap.value,  # ETH value sent
+            'volume': swap.volume,  # ETH or WETH going in
+            'swap': swap_call,
+            'out': swap_call.amount_out_min,
+            'token': swap_call.path[-1],
+            'pair': swap.pair,
+            'received_at': swap.received_at,
+            'reserves': swap.reserves and Reserves(*swap.reserves),
+            'projected': swap.projected,
+            'evaluation': swap.evaluation,
+        }
+        self.complete_swap(swap_info)
+        self.metrics.observe('evaluate', time.perf_counter() - swap.received_at)
+        self.pipeline.decision_queue.put(swap_info)
+    
+    def complete_swap(self, swap_info):
+        """Loop-side part of an evaluated swap: pending cycles, token prefetch, log line"""
+        # Cycles scored with the pair where the pending swaps leave it, the graph stays confirmed
+        swap_info['cycles'], swap_info['cycle_overlay'] = [], None
+        if swap_info['projected'] is not None:
+            swap_info['cycles'], swap_info['cycle_overlay'] = self.route_finder.pending_cycles(
+                swap_info['pair'], swap_info['projected']
+            )
+        swap_call = swap_info['swap']
+        self.token_cache.prefetch(swap_call.path)
+        
+        # %-style args so formatting happens on the logging thread
+        logging.info(
+            "Swap %s %s eth volume: %d token amount: %d",
+            swap_info['tx_hash'], swap_call.method, swap_info['volume'], swap_info['out']
+        )
+    
+    def observe_tips(self, tips):
+        """Priority fees of router swaps parsed on the shard workers"""
+        if self.submitter is not None:
+            observe = self.submitter.fees.observe_priority
+            for tip in tips:
+                observe(tip)
+
+    def seed_pair(self, pair):
+        """PairIndexer hook: a pair that Synced before it was indexed gets its reserves now"""
+        reserves = self.reserve_store.get(pair)
+        if reserves is not None:
+            self.route_finder.update(pair, reserves)
+
     async def subscribe_to_pending_txs(self, websocket):
         subscription = {
             "jsonrpc": "2.0", 
@@ -225,33 +469,93 @@ class UniswapV2Monitor:
         }
         await websocket.send(json.dumps(subscription))
         response = await websocket.recv()
-        print(f"Subscription confirmed: {response}")
+        logging.info(f"Subscription confirmed: {response}")
     
-    async def listen_for_transactions(self, websocket):
+    async def monitor_mempool(self):
+        """Monitor mempool for pending Uniswap transactions (requires WebSocket)"""
+        logging.info("Monitoring mempool for Uniswap swaps...")
+        
+        logging.info(f"Mempool feeds: {', '.join(self.mempool_feed.endpoints)}")
+        
+        if self.sharded is not None:
+            self.sharded.start()
+        self.pipeline.start()
+        
+        try:
+            await self.mempool_feed.run()
+        finally:
+            if self.sharded is not None:
+                self.sharded.close()
+
+    async def subscribe_to_pair_logs(self, websocket):
+        subscription = {
+            "jsonrpc": "2.0", 
+            "method": "eth_subscribe",
+            "params": [
+                "logs",
+                {
+                    "topics": self.reserve_store.topics
+                }
+            ],
+            "id": 2
+        }
+        await websocket.send(json.dumps(subscription))
+        response = await websocket.recv()
+        logging.info(f"Log subscription confirmed: {response}")
+
+    async def listen_for_logs(self, websocket):
+        apply_log = self.reserve_store.apply_log
         async for message in websocket:
             try:
                 data = json.loads(message)
                 if 'params' in data and 'result' in data['params']:
-                    transaction = data['params']['result']
-                    asyncio.create_task(self.handle_pending_tx_async(transaction))
+                    apply_log(data['params']['result'])
             except Exception as e:
-                print(f"Error processing message: {e}")
+                logging.error(f"Error processing log: {e}")
 
-    async def monitor_mempool(self):
-        """Monitor mempool for pending Uniswap transactions (requires WebSocket)"""
-        logging.info("Monitoring mempool for Uniswap swaps...")
-        
-        print(f"why? {self.w3soc}")
+    async def monitor_reserves(self):
+        """Keep the local reserve mirror current from Sync/Swap logs (requires WebSocket)"""
+        logging.info("Monitoring pair reserves...")
         
         while True:
             try:
                 async with websockets.connect(self.w3soc) as websocket:
-                    await self.subscribe_to_pending_txs(websocket)
-                    await self.listen_for_transactions(websocket)
+                    await self.subscribe_to_pair_logs(websocket)
+                    await self.listen_for_logs(websocket)
             except Exception as e:
-                print(f"WebSocket connection failed: {e}")
-                print("Reconnecting in 5 seconds...")
+                logging.error(f"Log subscription failed: {e}")
+                logging.info("Reconnecting in 5 seconds...")
                 await asyncio.sleep(5)
 
-    def handle_swap_detected(self, swap_info):
+    async def run(self):
+        """Run the reserve mirror and the mempool monitor together"""
+        await self.connect()
+        
+        if constant.METRICS_PORT:
+            await self.metrics.serve(port = constant.METRICS_PORT)
+        
+        # The feeds start right away, caches and the submitter warm up next to them
+        tasks = [self.token_cache.load(), self.index_pairs()]
+        if self.submitter is not None:
+            tasks.append(self.run_submitter())
+        
+        await asyncio.gather(
+            self.monitor_mempool(),
+            self.monitor_reserves(),
+            self.metrics.log_summary_periodically(constant.METRICS_SUMMARY_INTERVAL),
+            *tasks
+        )
+    
+    async def index_pairs(self):
+        """Load the checkpointed pair index, then keep it current"""
+        await self.pair_indexer.load()
+        await self.pair_indexer.follow()
+    
+    async def run_submitter(self):
+        await self.submitter.start()
+        await self.submitter.follow_heads(self.w3soc)
+
+    async def handle_swap_detected(self, swap_info):
+        self.metrics.inc('decisions')
+        self.metrics.observe('decision', time.perf_counter() - swap_info['received_at'])
         return None
\ No newline at end of file